@@ -1,18 +1,33 @@
 #GUI
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QLineEdit, QVBoxLayout, QPushButton, QMessageBox
-from PyQt5.QtCore import QSize, Qt, QUrl
-from PyQt5.QtGui import QIntValidator
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QLineEdit, QVBoxLayout, QHBoxLayout, QPushButton, QMessageBox, QProgressBar, QListWidget, QListWidgetItem, QCheckBox, QSpinBox, QComboBox
+from PyQt5.QtCore import QSize, Qt, QUrl, QThread, QTimer, pyqtSignal
+from PyQt5.QtGui import QIntValidator, QImage, QPixmap
 
+import json
+import os
 import sys
+from collections import deque
 
 #image processing
-import cv2
-import numpy as np
+# cv2 and numpy are slow to import, so color_quantization is only imported by the workers on their first run
+# and the window shows right away; albedo_paths is plain Python
+from albedo_paths import collect_image_paths, mask_path, mask_settings_path
+
+# Longest side of the downscaled proxy used for the interactive k preview
+PREVIEW_PROXY_SIZE = 256
+
+# Engine combo box entries, the values are color_quantization.ENGINES
+ENGINE_CHOICES = [("K-means", "kmeans"), ("Median cut (fast)", "mediancut"), ("Median cut + k-means pass", "mediancut_refined"), ("K-means on distinct colors", "histogram")]
 
 class DropArea(QLabel):
+    filesDropped = pyqtSignal(list)
+
     def __init__(self):
         super().__init__()
-        self.setText("Drop source albedo image here")
+        self.filePaths = []
+        # Until the first drop the label text is the only path there is
+        self.dropped = False
+        self.setText("Drop source albedo images or folders here")
         self.setAlignment(Qt.AlignCenter)
         self.setStyleSheet("border: 2px dashed #aaa; border-radius: 5px; padding: 25px;")
         self.setAcceptDrops(True)  # Enable drops
@@ -34,10 +49,17 @@ class DropArea(QLabel):
             for url in event.mimeData().urls():
                 file_path = url.toLocalFile()
                 file_paths.append(file_path)
-            
-            self.setText(file_paths[0])
-            # You can access the file path with file_paths[0] for the first file
-            # Or process multiple files with file_paths list
+
+            # Folders are expanded to the textures inside them, generated masks are left out
+            self.filePaths = collect_image_paths(file_paths)
+            self.dropped = True
+            if len(self.filePaths) == 1:
+                self.setText(self.filePaths[0])
+            elif not self.filePaths:
+                self.setText("No images found, drop source albedo images or folders here")
+            else:
+                self.setText(f"{len(self.filePaths)} images dropped")
+            self.filesDropped.emit(self.filePaths)
             event.accept()
         else:
             event.ignore()
@@ -45,6 +67,126 @@ class DropArea(QLabel):
         self.setStyleSheet("border: 2px dashed #aaa; border-radius: 5px; padding: 25px;")
         event.acceptProposedAction()
 
+class ConversionCancelled(Exception):
+    pass
+
+class ConversionWorker(QThread):
+    # Runs one albedo to mask conversion off the UI thread.
+    # cv2 releases the GIL while it works, so the window keeps painting during k-means.
+    progress = pyqtSignal(str, int)
+    converted = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, imagePath, k, makePreviews=True, initialCenters=None, maskChannels=3, pngCompression=None, engine="kmeans", parent=None):
+        super().__init__(parent)
+        self.imagePath = imagePath
+        # None picks k automatically
+        self.k = k
+        self.engine = engine
+        self.makePreviews = makePreviews
+        # 3 clusters per RGB mask, or 4 per RGBA mask
+        self.maskChannels = maskChannels
+        self.pngCompression = pngCompression
+        # Centers from the proxy preview, the full-resolution run starts from them with a single attempt
+        self.initialCenters = initialCenters
+        self._cancelRequested = False
+
+    def cancel(self):
+        self._cancelRequested = True
+
+    def onProgress(self, stage, percent):
+        # Called by quantize_colors between steps, raising here is how a conversion gets cancelled
+        if self._cancelRequested:
+            raise ConversionCancelled()
+        self.progress.emit(stage, percent)
+
+    def run(self):
+        try:
+            result = self.quantizeColors(self.imagePath, self.k)
+        except ConversionCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.converted.emit(result)
+
+    def quantizeColors(self, imagePath, k=6):
+        import color_quantization
+        from palette_cache import PaletteCache
+        from run_report import RunReport
+
+        # Same pipeline as the command line, with the GUI's naming: masks count from 1 and the last one keeps leftover clusters
+        report = RunReport()
+        previews = [] if self.makePreviews else None
+        maskLayout = 'rgba' if self.maskChannels == 4 else 'rgb'
+        centers = color_quantization.quantize_colors(
+            imagePath, color_quantization.AUTO_K if k is None else k, show=False, engine=self.engine, cache=PaletteCache(),
+            initial_centers=self.initialCenters, report=report, mask_layout=maskLayout, png_compression=self.pngCompression,
+            include_partial=True, first_mask_index=1, previews=previews, progress=self.onProgress)
+        try:
+            writeMaskSettings(imagePath, maskSettings(k, self.engine, self.maskChannels, self.pngCompression), report.outputs)
+        except OSError:
+            # The masks are fine, the next batch just won't be able to skip this texture
+            pass
+        return {"imagePath": imagePath, "k": report.k, "kSelection": report.k_selection, "centers": centers, "outputPaths": report.outputs, "previews": previews or []}
+
+class PreviewWorker(QThread):
+    # Clusters a small pyramid level of the albedo so k can be tuned interactively
+    previewReady = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, imagePath, k, proxyRgb=None, engine="kmeans", parent=None):
+        super().__init__(parent)
+        self.imagePath = imagePath
+        self.k = k
+        self.proxyRgb = proxyRgb
+        self.engine = engine
+
+    def run(self):
+        try:
+            import color_quantization
+            if self.proxyRgb is None:
+                self.proxyRgb = color_quantization.load_proxy(self.imagePath, PREVIEW_PROXY_SIZE)
+            # k is None for "Auto", the candidates are scored on the proxy
+            pickedK, centers, clusteredRgb = color_quantization.cluster_proxy(self.proxyRgb, color_quantization.AUTO_K if self.k is None else self.k, self.engine)
+        except Exception as e:
+            self.failed.emit(str(e))
+            return
+        height, width = clusteredRgb.shape[:2]
+        qImage = QImage(clusteredRgb.data, width, height, 3 * width, QImage.Format_RGB888).copy()
+        self.previewReady.emit({"imagePath": self.imagePath, "k": self.k, "engine": self.engine, "pickedK": pickedK, "centers": centers, "proxyRgb": self.proxyRgb, "image": qImage})
+
+def maskOutputPaths(imagePath, k, maskChannels=3):
+    # Same naming as ConversionWorker: one mask per 3 (or 4 packed) clusters, counting from 1
+    maskTotal = (k + maskChannels - 1) // maskChannels
+    return [mask_path(imagePath, maskIndex) for maskIndex in range(1, maskTotal + 1)]
+
+def maskSettings(k, engine, maskChannels, pngCompression):
+    # Everything that changes the masks of a texture, k is None for "Auto"
+    return {"k": k, "engine": engine, "maskChannels": maskChannels, "pngCompression": pngCompression}
+
+def writeMaskSettings(imagePath, settings, outputPaths):
+    with open(mask_settings_path(imagePath), 'w') as file:
+        json.dump(dict(settings, outputs=outputPaths), file, indent=1)
+
+def masksUpToDate(imagePath, settings):
+    # The masks were made from this source with the same settings, every one of them still exists and is
+    # newer than the source, and there is no mask left over from a bigger k
+    try:
+        sourceTime = os.path.getmtime(imagePath)
+        with open(mask_settings_path(imagePath)) as file:
+            savedSettings = json.load(file)
+    except (OSError, ValueError):
+        return False
+    if {name: savedSettings.get(name) for name in settings} != settings:
+        return False
+    paths = maskOutputPaths(imagePath, settings["k"], settings["maskChannels"])
+    for path in paths:
+        if not os.path.isfile(path) or os.path.getmtime(path) < sourceTime:
+            return False
+    return not os.path.isfile(mask_path(imagePath, len(paths) + 1))
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -52,141 +194,309 @@ class MainWindow(QMainWindow):
 
         #widget var
         self.convertButtonDefaultText = "Convert"
+        self.conversionQueue = deque()
+        self.workers = {}
+        # cv2.kmeans is multi-threaded itself, a few textures at a time is enough to fill the machine
+        self.maxWorkers = max(1, min(4, (os.cpu_count() or 2) // 2))
 
         #widget components
         self.dropImageFile = DropArea()
+        self.dropImageFile.filesDropped.connect(self.onFilesDropped)
 
         self.labelChannelAmount = QLabel("Total color amount")
         
         self.inputChannelAmount = QLineEdit()
         self.inputChannelAmount.setValidator(QIntValidator(1, 21))#limit the input is only int
         self.inputChannelAmount.setText("6")
+        self.inputChannelAmount.textChanged.connect(self.requestPreview)
+
+        # Pick k per texture from the elbow of the clustering cost
+        self.checkAutoChannelAmount = QCheckBox("Auto")
+        self.checkAutoChannelAmount.toggled.connect(self.onAutoToggled)
+
+        # Median cut is a single deterministic pass, much faster than k-means on big albedos
+        self.labelEngine = QLabel("Engine")
+        self.inputEngine = QComboBox()
+        for engineName, engine in ENGINE_CHOICES:
+            self.inputEngine.addItem(engineName, engine)
+        self.inputEngine.currentIndexChanged.connect(self.requestPreview)
+
+        # Four clusters per RGBA mask instead of three per RGB mask, fewer files to write
+        self.checkPackRgba = QCheckBox("Pack 4 colors per RGBA mask")
+
+        # Batches skip textures whose masks were already made with the same settings, unless forced
+        self.checkForceConvert = QCheckBox("Reconvert up-to-date textures")
+
+        # zlib level for the mask PNGs, -1 keeps OpenCV's default
+        self.labelPngCompression = QLabel("PNG compression")
+        self.inputPngCompression = QSpinBox()
+        self.inputPngCompression.setRange(-1, 9)
+        self.inputPngCompression.setSpecialValueText("Default")
+        self.inputPngCompression.setValue(-1)
+
+        # Low resolution preview of the clustering, refreshed as k changes
+        self.labelPreview = QLabel("Drop a single albedo to preview the clustering")
+        self.labelPreview.setAlignment(Qt.AlignCenter)
+        self.labelPreview.setMinimumHeight(PREVIEW_PROXY_SIZE)
+        self.previewWorker = None
+        self.previewPending = False
+        self.previewProxy = None
+        self.previewResult = None
+        # Debounce typing so only the last k gets clustered
+        self.previewDebounce = QTimer(self)
+        self.previewDebounce.setSingleShot(True)
+        self.previewDebounce.setInterval(150)
+        self.previewDebounce.timeout.connect(self.startPreview)
 
         self.button = QPushButton(self.convertButtonDefaultText)
         self.button.clicked.connect(self.onButtonClicked)
 
-        self.labelInputInstructions = QLabel("After images are shown, press any key on keyboard to continue")
+        self.buttonCancel = QPushButton("Cancel all")
+        self.buttonCancel.setEnabled(False)
+        self.buttonCancel.clicked.connect(self.onCancelClicked)
+
+        self.listFileStatus = QListWidget()
+        self.fileStatusItems = {}
+
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(0)
+
+        self.labelStatus = QLabel("Idle")
+
+        self.labelInputInstructions = QLabel("Previews open when a single conversion finishes, press any key in a preview to close them")
+
+        # cv2 preview windows only repaint while waitKey runs, pump them from the Qt event loop
+        self.previewTimer = QTimer(self)
+        self.previewTimer.setInterval(30)
+        self.previewTimer.timeout.connect(self.pumpPreviews)
 
         #layout
+        buttonLayout = QHBoxLayout()
+        buttonLayout.addWidget(self.button)
+        buttonLayout.addWidget(self.buttonCancel)
+
         layout = QVBoxLayout()
         layout.addWidget(self.dropImageFile)
         layout.addWidget(self.labelChannelAmount)
-        layout.addWidget(self.inputChannelAmount)
-        layout.addWidget(self.button)
+        channelLayout = QHBoxLayout()
+        channelLayout.addWidget(self.inputChannelAmount)
+        channelLayout.addWidget(self.checkAutoChannelAmount)
+        layout.addLayout(channelLayout)
+        engineLayout = QHBoxLayout()
+        engineLayout.addWidget(self.labelEngine)
+        engineLayout.addWidget(self.inputEngine)
+        layout.addLayout(engineLayout)
+        outputLayout = QHBoxLayout()
+        outputLayout.addWidget(self.checkPackRgba)
+        outputLayout.addWidget(self.labelPngCompression)
+        outputLayout.addWidget(self.inputPngCompression)
+        layout.addLayout(outputLayout)
+        layout.addWidget(self.checkForceConvert)
+        layout.addWidget(self.labelPreview)
+        layout.addLayout(buttonLayout)
+        layout.addWidget(self.listFileStatus)
+        layout.addWidget(self.progressBar)
+        layout.addWidget(self.labelStatus)
         layout.addWidget(self.labelInputInstructions)
 
         container = QWidget()
         container.setLayout(layout)
 
-        self.setMinimumSize(QSize(600, 300))
+        self.setMinimumSize(QSize(600, 700))
         # Set the central widget of the Window.
         self.setCentralWidget(container)
 
-    def onButtonClicked(self):
-        print("conversion funcion")
-        self.button.setText("Converting...")
-        self.button.setEnabled(False)
-
-        #check k input
-        
-        
-        file_path = self.dropImageFile.text()
-        if not self.inputChannelAmount.text():
-            QMessageBox.critical(self, "Invalid Total Color Amount input", f"Total Color Amount is empty")
+    def onFilesDropped(self, filePaths):
+        for filePath in filePaths:
+            self.setFileStatus(filePath, "Ready")
+        self.previewProxy = None
+        self.previewResult = None
+        self.requestPreview()
+
+    def onAutoToggled(self, checked):
+        self.inputChannelAmount.setEnabled(not checked)
+        self.requestPreview()
+
+    def selectedK(self):
+        # None when k is picked automatically, raises ValueError when the input is empty
+        if self.checkAutoChannelAmount.isChecked():
+            return None
+        return int(self.inputChannelAmount.text())
+
+    def requestPreview(self):
+        if len(self.dropImageFile.filePaths) != 1 or not (self.inputChannelAmount.text() or self.checkAutoChannelAmount.isChecked()):
             return
-        k = int(self.inputChannelAmount.text())
-        
-        self.quantizeColors(file_path, k)
-
-        self.button.setText(self.convertButtonDefaultText)
-        self.button.setEnabled(True)
-
+        self.previewDebounce.start()
 
-
-    def quantizeColors(self, imagePath, k=6):
-
-        # Read the image
-        image = cv2.imread(imagePath, cv2.IMREAD_COLOR)
-        if image is None:
-            #raise ValueError(f"Could not read image at {image_path}")
-            QMessageBox.critical(self, "File Path Error", f"Could not read image at {imagePath}")
+    def startPreview(self):
+        # One preview at a time, the newest request runs as soon as the current one ends
+        if self.previewWorker is not None:
+            self.previewPending = True
             return
+        if len(self.dropImageFile.filePaths) != 1 or not (self.inputChannelAmount.text() or self.checkAutoChannelAmount.isChecked()):
+            return
+        imagePath = self.dropImageFile.filePaths[0]
+        k = self.selectedK()
+        proxyRgb = self.previewProxy[1] if self.previewProxy is not None and self.previewProxy[0] == imagePath else None
+        self.previewWorker = PreviewWorker(imagePath, k, proxyRgb, self.inputEngine.currentData(), self)
+        self.previewWorker.previewReady.connect(self.onPreviewReady)
+        self.previewWorker.failed.connect(lambda message: self.labelPreview.setText(message))
+        self.previewWorker.finished.connect(self.onPreviewWorkerFinished)
+        self.previewWorker.start()
+
+    def onPreviewReady(self, result):
+        self.previewProxy = (result["imagePath"], result["proxyRgb"])
+        self.previewResult = result
+        self.labelPreview.setPixmap(QPixmap.fromImage(result["image"]))
+        self.labelPreview.setToolTip(f"Preview with k = {result['pickedK']}")
+
+    def onPreviewWorkerFinished(self):
+        self.previewWorker.deleteLater()
+        self.previewWorker = None
+        if self.previewPending:
+            self.previewPending = False
+            self.startPreview()
+
+    def previewCentersFor(self, imagePath, k, engine):
+        # Reuse the proxy centers when the committed file and k match what was previewed,
+        # the deterministic engines are fast enough to start from scratch
+        result = self.previewResult
+        if engine != "kmeans":
+            return None
+        if k is not None and result is not None and result["imagePath"] == imagePath and result["k"] == k and result["engine"] == engine:
+            return result["centers"]
+        return None
 
-        # Convert to RGB (OpenCV uses BGR by default)
-        imageRgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        # Reshape the image to a 2D array of pixels
-        pixels = imageRgb.reshape(-1, 3).astype(np.float32)
-
-
-        # Define criteria for K-means
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-        # Apply K-means clustering
-        _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
-        # Convert back to uint8
-        centers = np.uint8(centers)
-
-        originalCenters = centers #save the original copy
-
-        print(f"Image resolution: {image.shape[1]} x {image.shape[0]}")
-        print(f"Clustered values: \n {centers}")
-        print(len(labels))
-        self.showImage(originalCenters, labels, imageRgb, "clustered")
-
-        # First, set centers to all [0,0,0]
-        for i, center in enumerate(centers):
-            centers[i] = [0, 0, 0]
-
-        # Then, iterate through k, store every 3 channels in a mask
-        i = 0
-        j = i
-        while i < k:
-            if j == 0: 
-                centers[i] = [255, 0, 0]
-            elif j == 1:
-                centers[i] = [0, 255, 0]
-            elif j == 2:
-                centers[i] = [0, 0, 255]
-
-            i += 1
-            j = i % 3
-
-            if j == 0 or i == k: # time to save a mask
-                print(i)
-                maskIndex = int(i/3)
-                if i % 3 > 0: maskIndex += 1
-                print(maskIndex)
-                maskBgr = self.showImage(centers, labels, imageRgb, f"Mask_{maskIndex}")
-
-                outputPath = f"{imagePath.rsplit('.', 1)[0]}_Mask_{maskIndex}.png"
-
-                cv2.imwrite(outputPath, maskBgr)
-                print(f"Quantized image saved to {outputPath}")
-
-                # Reset centers to [0,0,0]
-                for index, center in enumerate(centers):
-                    centers[index] = [0, 0, 0]
-
-            
-        
-
-        # Wait for a key press and then close
-        cv2.waitKey(0)
-        cv2.destroyAllWindows()
-        return originalCenters
-    
-
-    def showImage(self, centers, labels, imageRgb, imageName):
-        centers = np.uint8(centers)
-        # Map each pixel to its corresponding center
-        imageFlat = centers[labels.flatten()]
-        # Reshape back to the original image shape
-        image = imageFlat.reshape(imageRgb.shape)
-        # Convert back to BGR for OpenCV
-        imageBgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        scaledImage = cv2.resize(imageBgr, (720, 720))
-        cv2.imshow(f"{imageName}", scaledImage)
-
-        return imageBgr
+    def onButtonClicked(self):
+        #check k input
+        filePaths = self.dropImageFile.filePaths if self.dropImageFile.dropped else [self.dropImageFile.text()]
+        if not filePaths:
+            QMessageBox.critical(self, "No images found", "The dropped files and folders contain no albedo images")
+            return
+        if not self.inputChannelAmount.text() and not self.checkAutoChannelAmount.isChecked():
+            QMessageBox.critical(self, "Invalid Total Color Amount input", f"Total Color Amount is empty")
+            return
+        k = self.selectedK()
+
+        maskChannels = 4 if self.checkPackRgba.isChecked() else 3
+        pngCompression = self.inputPngCompression.value() if self.inputPngCompression.value() >= 0 else None
+        engine = self.inputEngine.currentData()
+
+        # Queue the conversions, the button stays usable so more files can be added while others run
+        # A single texture is always converted, the button was pressed for exactly that file
+        makePreviews = len(filePaths) == 1
+        skipUpToDate = len(filePaths) > 1 and k is not None and not self.checkForceConvert.isChecked()
+        settings = maskSettings(k, engine, maskChannels, pngCompression)
+        for filePath in filePaths:
+            if skipUpToDate and masksUpToDate(filePath, settings):
+                self.setFileStatus(filePath, "Up to date, skipped")
+                continue
+            self.conversionQueue.append((filePath, k, makePreviews, self.previewCentersFor(filePath, k, engine), maskChannels, pngCompression, engine))
+            self.setFileStatus(filePath, "Queued")
+        self.startConversions()
+        self.updateStatus()
+
+    def onCancelClicked(self):
+        for filePath, *options in self.conversionQueue:
+            self.setFileStatus(filePath, "Cancelled")
+        self.conversionQueue.clear()
+        for worker in self.workers:
+            self.setFileStatus(worker.imagePath, "Cancelling...")
+            worker.cancel()
+
+    def startConversions(self):
+        # Fill the bounded pool from the queue
+        while self.conversionQueue and len(self.workers) < self.maxWorkers:
+            imagePath, k, makePreviews, initialCenters, maskChannels, pngCompression, engine = self.conversionQueue.popleft()
+            worker = ConversionWorker(imagePath, k, makePreviews, initialCenters, maskChannels, pngCompression, engine, self)
+            worker.progress.connect(lambda stage, percent, worker=worker: self.onConversionProgress(worker, stage, percent))
+            worker.converted.connect(lambda result, worker=worker: self.onConversionFinished(worker, result))
+            worker.failed.connect(lambda message, worker=worker: self.onConversionFailed(worker, message))
+            worker.cancelled.connect(lambda worker=worker: self.setFileStatus(worker.imagePath, "Cancelled"))
+            worker.finished.connect(lambda worker=worker: self.onWorkerFinished(worker))
+            self.workers[worker] = 0
+            self.setFileStatus(imagePath, "Starting")
+            worker.start()
+        if self.workers:
+            self.button.setText("Add to queue")
+            self.buttonCancel.setEnabled(True)
+
+    def onConversionProgress(self, worker, stage, percent):
+        self.workers[worker] = percent
+        self.setFileStatus(worker.imagePath, f"{stage} ({percent}%)")
+        self.progressBar.setValue(sum(self.workers.values()) // len(self.workers))
+
+    def onConversionFinished(self, worker, result):
+        if result["kSelection"] is None:
+            self.setFileStatus(worker.imagePath, f"Done, {len(result['outputPaths'])} masks written")
+        else:
+            # Keep the scores on the list entry so the automatic pick can be checked
+            selection = result["kSelection"]
+            self.setFileStatus(worker.imagePath, f"Done, auto k = {result['k']}, {len(result['outputPaths'])} masks written")
+            scores = "\n".join(f"k = {row['k']}: inertia {row['inertia']:.0f}" for row in selection["scores"])
+            self.fileStatusItems[worker.imagePath].setToolTip(f"{worker.imagePath}\nPicked k = {selection['k']} by {selection['method']}\n{scores}")
+        if result["previews"]:
+            self.showPreviews(result["previews"])
+
+    def onConversionFailed(self, worker, message):
+        self.setFileStatus(worker.imagePath, f"Failed: {message}")
+        # Only a single-file conversion gets a dialog, batch failures stay in the list
+        if worker.makePreviews:
+            QMessageBox.critical(self, "File Path Error", message)
+
+    def onWorkerFinished(self, worker):
+        # Runs after the worker thread has fully stopped, so its slot in the pool can be reused
+        self.workers.pop(worker, None)
+        worker.deleteLater()
+        self.startConversions()
+        if not self.workers:
+            self.button.setText(self.convertButtonDefaultText)
+            self.buttonCancel.setEnabled(False)
+            self.progressBar.setValue(0)
+        self.updateStatus()
+
+    def setFileStatus(self, filePath, status):
+        item = self.fileStatusItems.get(filePath)
+        if item is None:
+            item = QListWidgetItem()
+            self.listFileStatus.addItem(item)
+            self.fileStatusItems[filePath] = item
+        item.setText(f"{os.path.basename(filePath)}: {status}")
+        item.setToolTip(filePath)
+
+    def updateStatus(self):
+        if not self.workers:
+            self.labelStatus.setText("Idle")
+        else:
+            self.labelStatus.setText(f"Converting {len(self.workers)} textures, {len(self.conversionQueue)} queued")
+
+    def showPreviews(self, previews):
+        # HighGUI windows have to be created on the UI thread, cv2 is already loaded by the worker that made the previews
+        import cv2
+        for imageName, scaledImage in previews:
+            cv2.imshow(f"{imageName}", scaledImage)
+        self.previewTimer.start()
+
+    def pumpPreviews(self):
+        # Any key closes the previews, like the old blocking waitKey(0)
+        import cv2
+        if cv2.waitKey(1) != -1:
+            self.previewTimer.stop()
+            cv2.destroyAllWindows()
+
+    def closeEvent(self, event):
+        self.conversionQueue.clear()
+        for worker in list(self.workers):
+            worker.cancel()
+            worker.wait()
+        if self.previewWorker is not None:
+            self.previewWorker.wait()
+        self.previewTimer.stop()
+        # Nothing to close if no conversion ever loaded cv2
+        if "cv2" in sys.modules:
+            sys.modules["cv2"].destroyAllWindows()
+        super().closeEvent(event)
 
 
 app = QApplication(sys.argv)
@@ -0,0 +1,70 @@
+import glob
+import os
+
+# Only the standard library here, so front ends can list and name files before cv2 and numpy are loaded
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tga', '.tif', '.tiff', '.bmp')
+
+def mask_path(image_path, mask_index, mip_level=0):
+    # Reduced mip levels get their own _Mask_N_MipL.png next to the full size mask
+    mip = f"_Mip{mip_level}" if mip_level else ""
+    return f"{image_path.rsplit('.', 1)[0]}_Mask_{mask_index}{mip}.png"
+
+LABEL_MAP_SUFFIX = '_Labels.npy'
+
+def label_map_path(image_path):
+    return f"{image_path.rsplit('.', 1)[0]}{LABEL_MAP_SUFFIX}"
+
+def label_map_source(label_path):
+    # Stand-in source path for a label map, the other *_path helpers only look at the part before the extension
+    if not label_path.endswith(LABEL_MAP_SUFFIX):
+        raise ValueError(f"{label_path} is not a {LABEL_MAP_SUFFIX} label map")
+    return f"{label_path[:-len(LABEL_MAP_SUFFIX)]}.png"
+
+def mask_settings_path(image_path):
+    # The settings the GUI made the masks with, so a later run can tell whether they are still current
+    return f"{image_path.rsplit('.', 1)[0]}_MaskSettings.json"
+
+def palette_path(image_path):
+    return f"{image_path.rsplit('.', 1)[0]}_Palette.txt"
+
+def preview_path(image_path, preview_dir, image_name):
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(preview_dir, f"{stem}_{image_name}_Preview.png")
+
+def is_generated_output(path):
+    # Skip the _Mask_N.png and _Preview.png files we wrote ourselves so a re-run doesn't quantize them
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if stem.endswith('_Preview'):
+        return True
+    if '_Mip' in stem and stem.rsplit('_Mip', 1)[-1].isdigit():
+        stem = stem.rsplit('_Mip', 1)[0]
+    return stem.rsplit('_', 1)[0].endswith('_Mask') and stem.rsplit('_', 1)[-1].isdigit()
+
+def collect_image_paths(inputs):
+    # Expand files, directories and glob patterns into a de-duplicated list of textures
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            candidates = sorted(os.path.join(entry, name) for name in os.listdir(entry))
+        elif glob.has_magic(entry):
+            candidates = sorted(glob.glob(entry))
+        else:
+            paths.append(entry)
+            continue
+
+        for candidate in candidates:
+            if not os.path.isfile(candidate):
+                continue
+            if not candidate.lower().endswith(IMAGE_EXTENSIONS) or is_generated_output(candidate):
+                continue
+            paths.append(candidate)
+
+    seen = set()
+    unique_paths = []
+    for path in paths:
+        key = os.path.normcase(os.path.abspath(path))
+        if key not in seen:
+            seen.add(key)
+            unique_paths.append(path)
+    return unique_paths
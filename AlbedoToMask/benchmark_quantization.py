@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+import color_quantization as cq
+
+KINDS = ('palette', 'noisy')
+DEFAULT_SIZES = (512, 1024, 2048, 4096, 8192)
+DEFAULT_KS = (3, 6, 12, 21)
+QUICK_SIZES = (512, 1024)
+QUICK_KS = (3, 6)
+
+# A case counts as a regression when it is this much slower than the baseline
+REGRESSION_RATIO = 1.2
+
+def make_albedo(kind, size, seed=0):
+    # palette: flat patches from a small palette, like stylized albedos
+    # noisy: the same patches with a gradient and per-pixel noise, like photo-sourced albedos
+    rng = np.random.default_rng(seed)
+    palette = rng.integers(0, 256, size=(12, 3), dtype=np.uint8)
+    patches = rng.integers(0, len(palette), size=(32, 32))
+    image = cv2.resize(palette[patches], (size, size), interpolation=cv2.INTER_NEAREST)
+    if kind == 'noisy':
+        gradient = np.linspace(-24, 24, size, dtype=np.float32)[None, :, None]
+        noise = rng.normal(0, 12, size=(size, size, 3)).astype(np.float32)
+        image = np.clip(image.astype(np.float32) + gradient + noise, 0, 255).astype(np.uint8)
+    return image
+
+def peak_rss_mb():
+    # Peak resident set size of this process, None where it can't be measured
+    try:
+        import resource
+    except ImportError:
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset / (1 << 20)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+def run_case(image_path, case):
+    # Runs in a fresh process so the peak RSS belongs to this case alone
+    cv2.setNumThreads(case["threads"])
+    stages = {}
+
+    start = time.perf_counter()
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    stages["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    pixels = image_rgb.reshape(-1, 3).astype(np.float32)
+    stages["convert"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labels, centers = cq.cluster_pixels(pixels, case["k"], case["sample_size"], seed=case["seed"], engine=case["engine"])
+    stages["cluster"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    masks = cq.build_masks(labels, case["k"], image_rgb.shape[:2], channels=cq.MASK_CHANNELS[case["mask_layout"]])
+    stages["masks"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoded_bytes = 0
+    for mask in masks:
+        _, encoded = cv2.imencode('.png', mask)
+        encoded_bytes += len(encoded)
+    stages["encode"] = time.perf_counter() - start
+
+    result = dict(case)
+    result["stages"] = stages
+    result["total"] = sum(stages.values())
+    result["inertia"] = cq.compute_inertia(pixels, labels, centers)
+    result["encoded_bytes"] = encoded_bytes
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def case_name(case):
+    sample = f"_s{case['sample_size']}" if case["sample_size"] else ""
+    layout = f"_{case['mask_layout']}" if case["mask_layout"] != 'rgb' else ""
+    return f"{case['kind']}_{case['size']}_k{case['k']}_{case['engine']}{sample}{layout}"
+
+def run_benchmarks(sizes, ks, kinds, engines, sample_size=None, repeat=1, seed=0, threads=-1, output=None, mask_layout='rgb'):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="albedo_bench_") as temp_dir:
+        for kind in kinds:
+            for size in sizes:
+                image_path = os.path.join(temp_dir, f"{kind}_{size}.png")
+                cv2.imwrite(image_path, make_albedo(kind, size, seed))
+                for k in ks:
+                    for engine in engines:
+                        for run in range(repeat):
+                            case = {"kind": kind, "size": size, "k": k, "engine": engine, "sample_size": sample_size, "seed": seed, "threads": threads, "mask_layout": mask_layout, "run": run}
+                            case["name"] = case_name(case)
+                            with ProcessPoolExecutor(max_workers=1) as executor:
+                                result = executor.submit(run_case, image_path, case).result()
+                            result["cv2"] = cv2.__version__
+                            result["numpy"] = np.__version__
+                            result["machine"] = platform.machine()
+                            results.append(result)
+                            print_result(result)
+                            if output is not None:
+                                output.write(json.dumps(result) + "\n")
+                                output.flush()
+                os.remove(image_path)
+    return results
+
+def print_result(result):
+    stages = " ".join(f"{stage}={seconds:.3f}" for stage, seconds in result["stages"].items())
+    rss = f"{result['peak_rss_mb']:.0f}MB" if result["peak_rss_mb"] is not None else "n/a"
+    print(f"{result['name']:<36} total={result['total']:.3f}s {stages} rss={rss}", file=sys.stderr)
+
+def load_results(path):
+    with open(path) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+def compare_results(results, baseline, ratio=REGRESSION_RATIO):
+    # Best run per case on both sides, returns the names of cases that got slower than ratio
+    def best(rows):
+        totals = {}
+        for row in rows:
+            totals[row["name"]] = min(totals.get(row["name"], float('inf')), row["total"])
+        return totals
+
+    current, previous = best(results), best(baseline)
+    regressions = []
+    for name in sorted(current):
+        if name not in previous:
+            continue
+        change = current[name] / previous[name] if previous[name] > 0 else 1.0
+        flag = "REGRESSION" if change > ratio else ""
+        print(f"{name:<36} {previous[name]:>9.3f}s -> {current[name]:>9.3f}s {change:>6.2f}x {flag}", file=sys.stderr)
+        if change > ratio:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AlbedoToMask quantization pipeline on synthetic albedos")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Square texture sizes (default: 512 to 8192)")
+    parser.add_argument("--ks", type=int, nargs="+", default=DEFAULT_KS, help="Cluster counts (default: 3 6 12 21)")
+    parser.add_argument("--kinds", choices=KINDS, nargs="+", default=KINDS, help="Synthetic albedo styles")
+    parser.add_argument("--engines", choices=cq.ENGINES, nargs="+", default=('kmeans',), help="Clustering engines to compare")
+    parser.add_argument("--sample-size", type=int, default=None, help="Sampled fit size passed to the engine")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case, the comparison keeps the best one")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the synthetic images and the clustering")
+    parser.add_argument("--threads", type=int, default=-1, help="cv2.setNumThreads for each case (-1 lets OpenCV decide, 0 runs single-threaded)")
+    parser.add_argument("--mask-layout", choices=tuple(cq.MASK_CHANNELS), default='rgb', help="Mask packing used for the encode stage")
+    parser.add_argument("--quick", action="store_true", help="Only 512 and 1024 with k 3 and 6")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Write one JSON line per run to this file (default: stdout)")
+    parser.add_argument("--compare", type=str, default=None, help="Baseline JSON lines file, exits with 1 if a case is slower than the threshold")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_RATIO, help="Slowdown ratio that counts as a regression (default: 1.2)")
+    args = parser.parse_args()
+
+    sizes, ks = (QUICK_SIZES, QUICK_KS) if args.quick else (args.sizes, args.ks)
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        results = run_benchmarks(sizes, ks, args.kinds, args.engines, args.sample_size, args.repeat, args.seed, args.threads, output, args.mask_layout)
+    finally:
+        if args.output:
+            output.close()
+
+    if args.compare:
+        regressions = compare_results(results, load_results(args.compare), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions", file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
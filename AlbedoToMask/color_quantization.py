@@ -1,99 +1,933 @@
 import cv2
 import numpy as np
 import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
 
-def quantize_colors(image_path, k=8):
+from albedo_paths import IMAGE_EXTENSIONS, mask_path, label_map_path, label_map_source, palette_path, preview_path, is_generated_output, collect_image_paths
+from palette_cache import PaletteCache, DEFAULT_CACHE_BYTES
+from png_stream import PngStreamWriter, PNG_COMPRESSION
+from run_report import RunReport, append_json_line
+
+SAMPLE_METHODS = ('random', 'stratified')
+ENGINES = ('kmeans', 'histogram', 'mediancut', 'mediancut_refined')
+
+# Define criteria for K-means
+KMEANS_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
+KMEANS_ATTEMPTS = 10
+
+# Rows per chunk when assigning labels, bounds the pixels x k distance matrix
+ASSIGN_CHUNK_SIZE = 1 << 20
+
+# Above this many pixels a dense 2^24 bin count beats sorting the packed colors
+DENSE_HISTOGRAM_PIXELS = 1 << 22
+
+# Median cut bins colors on a grid of 2^MEDIAN_CUT_BITS levels per channel
+MEDIAN_CUT_BITS = 5
+
+# Pixels used to fit the centers in tiled mode when no sample size is given
+DEFAULT_TILE_SAMPLE_SIZE = 200000
+
+# Preview windows and preview files are PREVIEW_SIZE x PREVIEW_SIZE
+PREVIEW_SIZE = 720
+
+# Clusters per mask image: three in RGB masks, four when packed into RGBA
+MASK_CHANNELS = {'rgb': 3, 'rgba': 4}
+
+# Label map rows per band when re-masking, bounds the mask temporaries
+REMASK_BAND_ROWS = 512
+
+# Pass k=AUTO_K to pick the cluster count from K_RANGE on a shared pixel sample
+AUTO_K = 'auto'
+K_RANGE = (2, 21)
+K_SELECTION_METHODS = ('elbow', 'silhouette')
+K_SELECTION_SAMPLE_SIZE = 20000
+K_SELECTION_ATTEMPTS = 3
+# Silhouette needs pairwise distances, so it is scored on a smaller subset of the sample
+SILHOUETTE_SAMPLE_SIZE = 2000
+
+def quantize_colors(
+        image_path, k=8, *, show=True, verbose=True, sample_size=None, sample_method='random', engine='kmeans',
+        tile_size=None, label_path=None, cache=None, preview_dir=None, seed=None, initial_centers=None,
+        save_palette=False, report=None, k_range=K_RANGE, k_method='elbow', mask_layout='rgb', png_compression=None,
+        include_partial=True, first_mask_index=0, previews=None, progress=None, mip_levels=0):
+    # The one quantization pipeline behind both the CLI and the GUI.
+    # initial_centers warm-starts a single k-means attempt from a previous run's palette, which keeps
+    # channel assignment stable across color variants; seed makes the random parts reproducible.
+    # Pass a RunReport as report to get stage timings, clustering stats, the picked k and outputs back.
+    # k=AUTO_K scores every k in k_range on a pixel sample and runs only the best one at full resolution.
+    # mask_layout='rgba' packs four clusters per mask image, png_compression is the zlib level 0-9 (None keeps OpenCV's default).
+    # include_partial keeps a last, partly filled mask when k isn't a multiple of the mask channels;
+    # masks are numbered from first_mask_index. label_path keeps a 1 byte per pixel label map (plus the palette
+    # next to the source) so remask() can rebuild any mask layout later. A list passed as previews is filled with (name, image)
+    # pairs at PREVIEW_SIZE, and progress(stage, percent) is called as the work goes on, raise from it to cancel.
+    # mip_levels also writes that many halved mask levels (_Mask_N_Mip1.png, ...) from the same labels.
+    if tile_size:
+        # Streaming path for very large textures, there is no full-size preview to show
+        if cache is not None:
+            raise ValueError("The palette cache keeps whole label maps in memory and can't be combined with tile_size")
+        return quantize_colors_tiled(
+            image_path, k=k, tile_size=tile_size, sample_size=sample_size, sample_method=sample_method, engine=engine,
+            label_path=label_path, verbose=verbose, seed=seed, preview_dir=preview_dir, initial_centers=initial_centers,
+            save_palette=save_palette, report=report, k_range=k_range, k_method=k_method, mask_layout=mask_layout,
+            png_compression=png_compression, include_partial=include_partial, first_mask_index=first_mask_index,
+            progress=progress, mip_levels=mip_levels)
+
+    if report is None:
+        report = RunReport()
+    report.image_path, report.k, report.engine = image_path, k, engine
+    if progress is None:
+        progress = lambda stage, percent: None
+    if show and previews is None:
+        previews = []
 
     # Read the image
-    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    progress("Reading image", 0)
+    with report.stage("read"):
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
     if image is None:
         raise ValueError(f"Could not read image at {image_path}")
+    report.set_resolution(image.shape[1], image.shape[0])
     
     # Convert to RGB (OpenCV uses BGR by default)
-    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-    # Reshape the image to a 2D array of pixels
-    pixels = image_rgb.reshape(-1, 3).astype(np.float32)
-    
+    with report.stage("convert"):
+        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
-    # Define criteria for K-means
-    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-    # Apply K-means clustering
-    _, labels, centers = cv2.kmeans(pixels, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+    if k == AUTO_K:
+        progress("Selecting k", 2)
+        with report.stage("select_k"):
+            sample = sample_pixels(image_rgb.reshape(-1, 3), K_SELECTION_SAMPLE_SIZE, 'random', seed)
+            report.k_selection = select_k(sample, k_range, k_method, seed=seed)
+        k = report.k = report.k_selection["k"]
+        if verbose:
+            print_k_selection(report.k_selection)
+
+    # A repeat conversion of the same pixels with the same settings skips clustering entirely
+    cached = None
+    if cache is not None:
+        initial_key = None if initial_centers is None else np.asarray(initial_centers, dtype=np.float32).tobytes().hex()
+        with report.stage("cache"):
+            cache_key = cache.make_key(image, k, KMEANS_CRITERIA, KMEANS_ATTEMPTS, engine=engine, sample_size=sample_size, sample_method=sample_method, seed=seed, initial_centers=initial_key)
+            cached = cache.get(cache_key)
+
+    if cached is not None:
+        labels, centers = cached
+        report.cache_hit = True
+    else:
+        # Reshape the image to a 2D array of pixels
+        with report.stage("convert"):
+            pixels = image_rgb.reshape(-1, 3).astype(np.float32)
+        # Apply K-means clustering, optionally fitted on a subsample of the pixels
+        progress("Clustering", 5)
+        with report.stage("cluster"):
+            labels, centers = cluster_pixels(pixels, k, sample_size, sample_method, seed, engine, initial_centers, report.stats, progress)
+        if cache is not None:
+            # A full or read-only cache folder costs the next run a re-cluster, not this conversion
+            with report.stage("cache"):
+                try:
+                    cache.put(cache_key, labels, centers)
+                except OSError as e:
+                    print(f"Could not write the palette cache entry: {e}")
     # Convert back to uint8
     centers = np.uint8(centers)
     
     original_centers = centers #save the original copy
 
-    print(f"Image resolution: {image.shape[1]} x {image.shape[0]}")
-    print(f"Clustered values: \n {centers}")
-    print(len(labels))
-    show_image(original_centers, labels, image_rgb, "clustered")
-
-    # First, set centers to all [0,0,0]
-    for i, center in enumerate(centers):
-        centers[i] = [0, 0, 0]
-
-    # Then, iterate through k, store every 3 in a mask
-    i = 0
-    j = i
-    while i < k:
-        if j == 0: 
-            centers[i] = [255, 0, 0]
-        elif j == 1:
-            centers[i] = [0, 255, 0]
-        elif j == 2:
-            centers[i] = [0, 0, 255]
-
-        i += 1
-        j = i % 3
-
-        if j == 0: # time to save a mask
-            mask_index = int(i/3 - 1)
-            print(mask_index)
-            mask_bgr = show_image(centers, labels, image_rgb, f"Mask_{mask_index}")
-            
-            output_path = f"{image_path.rsplit('.', 1)[0]}_Mask_{mask_index}.png"
-
-            cv2.imwrite(output_path, mask_bgr)
-            print(f"Quantized image saved to {output_path}")
+    if verbose:
+        print(f"Image resolution: {image.shape[1]} x {image.shape[0]}")
+        print(f"Clustered values: \n {centers}")
+        print(len(labels))
+    channels = MASK_CHANNELS[mask_layout]
+    labels2d = labels.reshape(image_rgb.shape[:2])
+    if previews is not None or preview_dir:
+        with report.stage("preview"):
+            images = preview_images(labels2d, original_centers, k, channels, include_partial, first_mask_index)
+            if previews is not None:
+                previews.extend(images)
+            if preview_dir:
+                write_previews(images, image_path, preview_dir)
+    if save_palette or label_path:
+        write_palette(palette_path(image_path), original_centers)
+        report.add_output(palette_path(image_path))
+    if label_path:
+        with report.stage("labels"):
+            np.save(label_path, labels2d.astype(label_dtype(k), copy=False))
+        report.add_output(label_path)
 
-            # Reset centers to [0,0,0]
-            for index, center in enumerate(centers):
-                centers[index] = [0, 0, 0]
-    
-    # if k %3 != 0, then there will be less than 3 channels left for the last image, we need to print it as well
-    print(j)
-    
+    # Every mask comes out of one lookup over the labels, cluster i lands in channel i % 3 (i % 4 packed) of mask i // 3
+    progress("Building masks", 80)
+    with report.stage("masks"):
+        masks = build_masks(labels2d, k, labels2d.shape, include_partial, channels)
 
+    output_paths = [mask_path(image_path, first_mask_index + mask_index) for mask_index in range(len(masks))]
+    if mip_levels:
+        # The reduced levels come from the same labels and go out in the same write batch
+        with report.stage("mips"):
+            mip_images, mip_paths = mip_masks(labels2d, mask_lookup_table(k, include_partial, channels), mip_levels, image_path, first_mask_index)
+        masks, output_paths = list(masks) + mip_images, output_paths + mip_paths
+    progress(f"Writing {len(output_paths)} masks", 85)
+    with report.stage("write"):
+        write_masks(masks, output_paths, png_compression)
+    for output_path in output_paths:
+        report.add_output(output_path)
+        if verbose:
+            print(f"Quantized image saved to {output_path}")
+    progress("Done", 100)
 
-    
-    # Wait for a key press and then close
-    cv2.waitKey(0)
-    cv2.destroyAllWindows()
+    # Show the previews, wait for a key press and then close
+    if show:
+        for image_name, image_bgr in previews:
+            cv2.imshow(image_name, image_bgr)
+        cv2.waitKey(0)
+        cv2.destroyAllWindows()
     return original_centers
 
-def show_image(centers, labels, image_rgb, image_name):
+def build_image(centers, labels, shape):
+    # BGR image of every pixel replaced by its cluster color
+    return cv2.cvtColor(np.uint8(centers)[np.asarray(labels).reshape(shape)], cv2.COLOR_RGB2BGR)
+
+def preview_images(labels, centers, k, channels=3, include_partial=False, first_mask_index=0):
+    # (name, image) pairs at PREVIEW_SIZE, built from a strided view of the 2D label map so no full-size image is resized
+    height, width = labels.shape
+    step = max(1, min(height, width) // PREVIEW_SIZE)
+    small_labels = np.asarray(labels[::step, ::step])
+
+    images = [("Clustered", build_image(centers, small_labels, small_labels.shape))]
+    masks = build_masks(small_labels, k, small_labels.shape, include_partial, channels)
+    images += [(f"Mask_{first_mask_index + mask_index}", mask) for mask_index, mask in enumerate(masks)]
+    return [(image_name, cv2.resize(image_bgr, (PREVIEW_SIZE, PREVIEW_SIZE), interpolation=cv2.INTER_NEAREST)) for image_name, image_bgr in images]
+
+def load_proxy(image_path, max_size):
+    # pyrDown until the longest side fits max_size, each level halves the pixel work four times over
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read image at {image_path}")
+    while max(image.shape[:2]) > max_size:
+        image = cv2.pyrDown(image)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+def cluster_proxy(proxy_rgb, k, engine='kmeans', k_range=K_RANGE, k_method='elbow'):
+    # Quick clustering of a small proxy for interactive previews, returns (k, centers, clustered RGB image)
+    pixels = proxy_rgb.reshape(-1, 3).astype(np.float32)
+    if k == AUTO_K:
+        k = select_k(sample_pixels(pixels, K_SELECTION_SAMPLE_SIZE, 'random'), k_range, k_method)["k"]
+    if engine == 'kmeans':
+        # Fewer attempts than a full conversion, k-means++ seeding makes up for most of the difference
+        _, labels, centers = cv2.kmeans(pixels, k, None, KMEANS_CRITERIA, K_SELECTION_ATTEMPTS, cv2.KMEANS_PP_CENTERS)
+    else:
+        labels, centers = cluster_pixels(pixels, k, engine=engine)
+    clustered_rgb = np.ascontiguousarray(np.uint8(centers)[labels.ravel()].reshape(proxy_rgb.shape))
+    return k, centers, clustered_rgb
+
+def write_previews(images, image_path, preview_dir):
+    # Writes the (name, image) pairs from preview_images next to each other in preview_dir
+    os.makedirs(preview_dir, exist_ok=True)
+    paths = []
+    for image_name, image_bgr in images:
+        output_path = preview_path(image_path, preview_dir, image_name)
+        cv2.imwrite(output_path, image_bgr)
+        paths.append(output_path)
+    return paths
+
+def quantize_headless(image_path, k=8, preview_dir=None, verbose=False, **options):
+    # Importable entry point for farm nodes: no windows and no waitKey,
+    # previews are only produced as files when preview_dir is given
+    return quantize_colors(image_path, k, show=False, verbose=verbose, preview_dir=preview_dir, **options)
+
+def write_palette(path, centers):
+    # One "R G B" row per cluster, in cluster (and therefore mask channel) order
+    np.savetxt(path, np.uint8(centers), fmt='%d', header='R G B')
+
+def read_palette(path):
+    return np.loadtxt(path, dtype=np.float32, ndmin=2).reshape(-1, 3)
+
+def resolve_initial_centers(source, k, seed=None):
+    # source is a palette file, or a sibling texture whose saved palette (or a quick sampled fit) is used
+    if not source.lower().endswith(IMAGE_EXTENSIONS):
+        centers = read_palette(source)
+    elif os.path.isfile(palette_path(source)):
+        centers = read_palette(palette_path(source))
+    else:
+        image = cv2.imread(source, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Could not read image at {source}")
+        pixels = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).reshape(-1, 3)
+        _, centers = cluster_pixels(pixels.astype(np.float32), k, DEFAULT_TILE_SAMPLE_SIZE, 'stratified', seed)
+    if len(centers) != k:
+        raise ValueError(f"{source} holds {len(centers)} colors but k is {k}")
+    return np.float32(centers)
+
+def mask_count(k, include_partial=False, channels=3):
+    # One cluster per channel, include_partial also keeps the last mask when k % channels != 0
+    return -(-k // channels) if include_partial else k // channels
+
+def mask_lookup_table(k, include_partial=False, channels=3, order=None):
+    # (masks, k, channels) RGB(A) table: the cluster in slot i is full intensity in channel i % channels of mask i // channels.
+    # order lists the cluster for each slot (default: cluster i in slot i), clusters left out of it end up in no mask.
+    if order is None:
+        order = np.arange(k)
+    order = np.asarray(order, dtype=np.intp)
+    if len(np.unique(order)) != len(order) or order.min(initial=0) < 0 or order.max(initial=0) >= k:
+        raise ValueError(f"Cluster order must list distinct clusters between 0 and {k - 1}")
+    count = mask_count(len(order), include_partial, channels)
+    lut = np.zeros((count, k, channels), dtype=np.uint8)
+    slots = np.arange(min(len(order), count * channels))
+    lut[slots // channels, order[slots], slots % channels] = 255
+    return lut
+
+def build_masks(labels, k, shape, include_partial=False, channels=3):
+    # All BGR(A) masks in a single gather over the labels, returned as a (masks, height, width, channels) array
+    lut = mask_lookup_table(k, include_partial, channels)[..., [2, 1, 0, 3][:channels]]
+    return np.take(lut, np.asarray(labels).reshape(shape), axis=1)
+
+def write_masks(masks, output_paths, compression=None, workers=None):
+    # PNG encoding is single-threaded per image but cv2 releases the GIL, so encode all masks at once.
+    # Setting a level also switches OpenCV from its RLE default to the default zlib strategy, so None leaves both alone.
+    params = [] if compression is None else [cv2.IMWRITE_PNG_COMPRESSION, compression]
+    def write(mask, output_path):
+        if not cv2.imwrite(output_path, mask, params):
+            raise OSError(f"Could not write {output_path}")
+    with ThreadPoolExecutor(max_workers=workers or max(1, min(len(output_paths), os.cpu_count() or 1))) as executor:
+        list(executor.map(write, masks, output_paths))
+
+def stream_masks(labels, lut, output_paths, band_rows, png_compression=None, reduce=False):
+    # Writes every mask in one pass over a 2D label map (in memory or memory-mapped), band_rows at a time.
+    # lut is in file channel order (RGB / RGBA); zlib releases the GIL so the masks compress in parallel.
+    # reduce also returns the half size label map of downsample_labels, built from the same bands.
+    height, width = labels.shape
+    channels = lut.shape[-1]
+    reduced = None
+    if reduce:
+        band_rows = max(2, band_rows - band_rows % 2)
+        reduced = np.empty(((height + 1) // 2, (width + 1) // 2), dtype=labels.dtype)
+    with ExitStack() as stack:
+        writers = [stack.enter_context(PngStreamWriter(output_path, width, height, channels, PNG_COMPRESSION if png_compression is None else png_compression)) for output_path in output_paths]
+        executor = stack.enter_context(ThreadPoolExecutor(max_workers=max(1, min(len(writers), os.cpu_count() or 1))))
+        for top in range(0, height, band_rows):
+            band = np.asarray(labels[top:top + band_rows])
+            band_masks = np.take(lut, band, axis=1)
+            if reduced is not None:
+                reduced[top // 2:(top + band_rows) // 2] = majority_2x2(band)
+            list(executor.map(PngStreamWriter.write_rows, writers, band_masks))
+    return reduced
+
+def majority_2x2(band):
+    # Majority label of every 2x2 block of an even-row band (ties go to the top-left pixel), odd edges repeat the last pixel
+    if band.shape[0] % 2 or band.shape[1] % 2:
+        band = np.pad(band, ((0, band.shape[0] % 2), (0, band.shape[1] % 2)), mode='edge')
+    a, b, c, d = band[0::2, 0::2], band[0::2, 1::2], band[1::2, 0::2], band[1::2, 1::2]
+    vote = np.where((b == c) | (b == d), b, np.where(c == d, c, a))
+    return np.where((a == b) | (a == c) | (a == d), a, vote)
+
+def downsample_labels(labels, band_rows=REMASK_BAND_ROWS):
+    # Half size label map, each pixel takes the majority label of its 2x2 block (ties go to the top-left pixel)
+    # so reduced masks stay hard-edged. Read band_rows at a time, a memory-mapped label map is only read once.
+    height, width = labels.shape
+    band_rows = max(2, band_rows - band_rows % 2)
+    reduced = np.empty(((height + 1) // 2, (width + 1) // 2), dtype=labels.dtype)
+    for top in range(0, height, band_rows):
+        reduced[top // 2:(top + band_rows) // 2] = majority_2x2(np.asarray(labels[top:top + band_rows]))
+    return reduced
+
+def mip_masks(labels, lut, levels, image_path, first_mask_index=0, band_rows=REMASK_BAND_ROWS):
+    # BGR(A) masks and output paths for mip levels 1..levels, each level's labels downsampled from the level above.
+    # lut is in file channel order (RGB / RGBA) like for stream_masks; the chain stops at 1 x 1.
+    bgr_lut = lut[..., [2, 1, 0, 3][:lut.shape[-1]]]
+    masks, output_paths = [], []
+    for level in range(1, levels + 1):
+        if labels.shape == (1, 1):
+            break
+        labels = downsample_labels(labels, band_rows)
+        masks.extend(np.take(bgr_lut, labels, axis=1))
+        output_paths += [mask_path(image_path, first_mask_index + mask_index, level) for mask_index in range(len(lut))]
+    return masks, output_paths
+
+def stream_mip_masks(reduced, lut, levels, image_path, first_mask_index=0, band_rows=REMASK_BAND_ROWS, png_compression=None):
+    # Streams mip levels 1..levels like stream_masks, starting from the level 1 labels that stream_masks(reduce=True)
+    # returned; each level downsamples the next in its own pass, so no full mask image is ever built. Stops at 1 x 1.
+    output_paths = []
+    for level in range(1, levels + 1):
+        level_paths = [mask_path(image_path, first_mask_index + mask_index, level) for mask_index in range(len(lut))]
+        reduced = stream_masks(reduced, lut, level_paths, band_rows, png_compression, reduce=level < levels and reduced.shape != (1, 1))
+        output_paths += level_paths
+        if reduced is None:
+            break
+    return output_paths
+
+def label_dtype(k):
+    # Label maps take 1 byte per pixel up to 256 clusters
+    return np.uint8 if k <= 256 else np.int32
+
+def remask(label_path, mask_layout='rgb', order=None, include_partial=True, first_mask_index=0, png_compression=None, band_rows=REMASK_BAND_ROWS, k=None, verbose=True, mip_levels=0):
+    # Rebuilds the masks of a texture from its saved _Labels.npy alone, without reading the source or clustering again.
+    # The label map is memory-mapped and read once, every mask is streamed out in that same pass.
+    # k comes from the palette saved next to the source unless given; order regroups or reorders the clusters.
+    labels = np.load(label_path, mmap_mode='r')
+    if labels.ndim != 2:
+        raise ValueError(f"{label_path} is not a 2D label map")
+    image_path = label_map_source(label_path)
+    if k is None:
+        k = len(read_palette(palette_path(image_path)))
+    lut = mask_lookup_table(k, include_partial, MASK_CHANNELS[mask_layout], order)
+    output_paths = [mask_path(image_path, first_mask_index + mask_index) for mask_index in range(len(lut))]
+    # The first mip level is downsampled in the same pass, so the label map is still read only once
+    reduced = stream_masks(labels, lut, output_paths, band_rows, png_compression, reduce=mip_levels > 0 and labels.shape != (1, 1))
+    if reduced is not None:
+        output_paths += stream_mip_masks(reduced, lut, mip_levels, image_path, first_mask_index, band_rows, png_compression)
+    if verbose:
+        for output_path in output_paths:
+            print(f"Mask saved to {output_path}")
+    return output_paths
+
+def quantize_colors_tiled(
+        image_path, k=8, *, tile_size=512, sample_size=None, sample_method='stratified', engine='kmeans',
+        label_path=None, verbose=True, seed=None, preview_dir=None, initial_centers=None, save_palette=False,
+        report=None, k_range=K_RANGE, k_method='elbow', mask_layout='rgb', png_compression=None,
+        include_partial=True, first_mask_index=0, progress=None, mip_levels=0):
+    # Works on bands of tile_size rows: only the decoded uint8 source, a 1 byte per pixel label
+    # buffer (optionally memory-mapped to label_path) and one band of temporaries are alive at once.
+    # Masks are streamed to disk band by band instead of being built as full images.
+    if report is None:
+        report = RunReport()
+    report.image_path, report.k, report.engine = image_path, k, engine
+    if progress is None:
+        progress = lambda stage, percent: None
+
+    progress("Reading image", 0)
+    with report.stage("read"):
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read image at {image_path}")
+    height, width = image.shape[:2]
+    report.set_resolution(width, height)
+    tops = range(0, height, tile_size)
+
+    # Fit the centers on a sample gathered band by band, proportional to each band's size
+    sample_size = sample_size or DEFAULT_TILE_SAMPLE_SIZE
+    samples = []
+    with report.stage("sample"):
+        for index, top in enumerate(tops):
+            band = cv2.cvtColor(image[top:top + tile_size], cv2.COLOR_BGR2RGB).reshape(-1, 3)
+            band_sample_size = max(1, round(sample_size * len(band) / (height * width)))
+            band_seed = None if seed is None else seed + index
+            samples.append(sample_pixels(band, band_sample_size, sample_method, band_seed))
+    if k == AUTO_K:
+        progress("Selecting k", 2)
+        with report.stage("select_k"):
+            sample = np.concatenate(samples)
+            report.k_selection = select_k(sample_pixels(sample, K_SELECTION_SAMPLE_SIZE, 'random', seed), k_range, k_method, seed=seed)
+        k = report.k = report.k_selection["k"]
+        if verbose:
+            print_k_selection(report.k_selection)
+    progress("Clustering", 5)
+    with report.stage("cluster"):
+        _, centers = cluster_pixels(np.concatenate(samples), k, seed=seed, engine=engine, initial_centers=initial_centers, stats=report.stats, progress=progress)
+
+    if label_path:
+        labels = np.lib.format.open_memmap(label_path, mode='w+', dtype=label_dtype(k), shape=(height, width))
+    else:
+        labels = np.empty((height, width), dtype=label_dtype(k))
+    progress("Assigning labels", 70)
+    with report.stage("assign"):
+        for top in tops:
+            band = cv2.cvtColor(image[top:top + tile_size], cv2.COLOR_BGR2RGB).reshape(-1, 3)
+            labels[top:top + tile_size] = assign_labels(band, centers).reshape(-1, width)
+    del image
+
     centers = np.uint8(centers)
-    # Map each pixel to its corresponding center
-    image_flat = centers[labels.flatten()]
-    # Reshape back to the original image shape
-    image = image_flat.reshape(image_rgb.shape)
-    # Convert back to BGR for OpenCV
-    image_bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-    scaled_img = cv2.resize(image_bgr, (720, 720))
-    cv2.imshow(f"{image_name}", scaled_img)
-
-    return image_bgr
-        
+    if verbose:
+        print(f"Image resolution: {width} x {height}")
+        print(f"Clustered values: \n {centers}")
+
+    # Every mask is written in the same pass over the label bands, zlib releases the GIL so the masks compress in parallel
+    channels = MASK_CHANNELS[mask_layout]
+    lut = mask_lookup_table(k, include_partial, channels)
+    output_paths = [mask_path(image_path, first_mask_index + mask_index) for mask_index in range(len(lut))]
+    progress(f"Writing {len(output_paths)} masks", 85)
+    with report.stage("write"):
+        reduced = stream_masks(labels, lut, output_paths, tile_size, png_compression, reduce=mip_levels > 0 and labels.shape != (1, 1))
+    if reduced is not None:
+        # Each level is streamed from a quarter size label map, never as full mask images
+        with report.stage("mips"):
+            output_paths += stream_mip_masks(reduced, lut, mip_levels, image_path, first_mask_index, tile_size, png_compression)
+    for output_path in output_paths:
+        report.add_output(output_path)
+        if verbose:
+            print(f"Quantized image saved to {output_path}")
+
+    if preview_dir:
+        with report.stage("preview"):
+            write_previews(preview_images(labels, centers, k, channels, include_partial, first_mask_index), image_path, preview_dir)
+    if save_palette or label_path:
+        write_palette(palette_path(image_path), centers)
+        report.add_output(palette_path(image_path))
+
+    if label_path:
+        labels.flush()
+        report.add_output(label_path)
+    progress("Done", 100)
+    return centers
+
+def cluster_pixels(pixels, k, sample_size=None, sample_method='random', seed=None, engine='kmeans', initial_centers=None, stats=None, progress=None):
+    # Returns (labels, centers) in the cv2.kmeans layout: int32 (N, 1) labels and float32 (k, 3) centers
+    # stats, when given, is filled with compactness, fit_points and iterations (None where cv2 doesn't report it)
+    # progress(stage, percent), when given, is called between k-means attempts
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine}, expected one of {ENGINES}")
+    if initial_centers is not None and len(initial_centers) != k:
+        raise ValueError(f"Got {len(initial_centers)} initial centers for k={k}")
+    if seed is not None:
+        cv2.setRNGSeed(seed)
+    if engine == 'histogram':
+        # Unique colors are already a compact summary of the texture, sampling is not needed
+        return cluster_unique_colors(pixels, k, seed, initial_centers, stats)
+    if engine in ('mediancut', 'mediancut_refined'):
+        # Linear in the pixel count and deterministic, so neither sampling nor attempts apply
+        if initial_centers is None:
+            labels, centers = median_cut(pixels, k)
+        else:
+            centers = np.float32(initial_centers)
+            labels = assign_labels(pixels, centers)
+        if engine == 'mediancut_refined':
+            return refine_kmeans(pixels, labels, k, stats)
+        if stats is not None:
+            stats.update(compactness=compute_inertia(pixels, labels, centers), fit_points=len(pixels), iterations=0)
+        return labels, centers
+
+    if sample_size is None or sample_size >= len(pixels):
+        return run_kmeans(pixels, k, initial_centers, stats, progress)
+
+    # Fit the centers on the sample only, then label every pixel in one nearest-center pass
+    sample = sample_pixels(pixels, sample_size, sample_method, seed)
+    _, centers = run_kmeans(sample, k, initial_centers, stats, progress)
+    labels = assign_labels(pixels, centers)
+    return labels, centers
+
+def run_kmeans(data, k, initial_centers=None, stats=None, progress=None):
+    if initial_centers is None and progress is None:
+        compactness, labels, centers = cv2.kmeans(data, k, None, KMEANS_CRITERIA, KMEANS_ATTEMPTS, cv2.KMEANS_RANDOM_CENTERS)
+    elif initial_centers is None:
+        # One attempt per call so the caller can report progress (or cancel) between attempts, the best one wins
+        compactness = None
+        for attempt in range(KMEANS_ATTEMPTS):
+            progress(f"Clustering, attempt {attempt + 1} of {KMEANS_ATTEMPTS}", 5 + 75 * attempt // KMEANS_ATTEMPTS)
+            attempt_compactness, attempt_labels, attempt_centers = cv2.kmeans(data, k, None, KMEANS_CRITERIA, 1, cv2.KMEANS_RANDOM_CENTERS)
+            if compactness is None or attempt_compactness < compactness:
+                compactness, labels, centers = attempt_compactness, attempt_labels, attempt_centers
+    else:
+        # cv2.kmeans only accepts initial labels, so seed them from the nearest given center, one attempt is enough
+        labels = assign_labels(data, initial_centers)
+        compactness, labels, centers = cv2.kmeans(data, k, labels, KMEANS_CRITERIA, 1, cv2.KMEANS_USE_INITIAL_LABELS)
+    if stats is not None:
+        # cv2.kmeans doesn't expose its iteration count
+        stats.update(compactness=float(compactness), fit_points=len(data), iterations=None)
+    return labels, centers
+
+def sample_pixels(pixels, sample_size, method='random', seed=None):
+    if method not in SAMPLE_METHODS:
+        raise ValueError(f"Unknown sample method {method}, expected one of {SAMPLE_METHODS}")
+    rng = np.random.default_rng(seed)
+    count = len(pixels)
+    sample_size = max(1, min(sample_size, count))
+
+    if method == 'random':
+        indices = rng.choice(count, size=sample_size, replace=False)
+    else:
+        # One pixel per equal-sized run of rows, so every region of the texture is represented
+        edges = np.linspace(0, count, sample_size + 1)
+        indices = (edges[:-1] + rng.random(sample_size) * np.diff(edges)).astype(np.int64)
+        indices = np.minimum(indices, count - 1)
+
+    return np.ascontiguousarray(pixels[indices], dtype=np.float32)
+
+def assign_labels(pixels, centers):
+    # Nearest center per pixel using |x|^2 - 2x.c + |c|^2, chunked to bound the distance matrix
+    centers = np.asarray(centers, dtype=np.float32)
+    center_norms = np.einsum('ij,ij->i', centers, centers)
+    labels = np.empty((len(pixels), 1), dtype=np.int32)
+    for start in range(0, len(pixels), ASSIGN_CHUNK_SIZE):
+        chunk = np.asarray(pixels[start:start + ASSIGN_CHUNK_SIZE], dtype=np.float32)
+        distances = center_norms - 2.0 * (chunk @ centers.T)
+        labels[start:start + len(chunk), 0] = np.argmin(distances, axis=1)
+    return labels
+
+def median_cut(pixels, k):
+    # Pixels are binned on a 2^(3 * MEDIAN_CUT_BITS) RGB grid with a few bincounts, then the box holding the most
+    # squared error is cut in two along the channel and position that removes the most error, until there are k boxes.
+    # Every pass over the pixels is O(N), the splitting only sees the occupied bins.
+    pixels = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+    shift = 8 - MEDIAN_CUT_BITS
+    grid = np.clip(pixels, 0, 255).astype(np.int32) >> shift
+    bins = (grid[:, 0] << (2 * MEDIAN_CUT_BITS)) | (grid[:, 1] << MEDIAN_CUT_BITS) | grid[:, 2]
+    del grid
+    size = 1 << (3 * MEDIAN_CUT_BITS)
+    counts = np.bincount(bins, minlength=size)
+    occupied = np.flatnonzero(counts)
+    weights = counts[occupied].astype(np.float64)
+    # Exact mean color of the pixels in each occupied bin
+    means = np.stack([np.bincount(bins, weights=pixels[:, channel], minlength=size)[occupied] for channel in range(3)], axis=1) / weights[:, None]
+
+    def best_cut(box):
+        # (error, remaining error, left, right) for the best cut of box along any channel, from prefix sums of the sorted bins
+        w = weights[box]
+        error = float(np.sum(w[:, None] * (means[box] - np.average(means[box], axis=0, weights=w)) ** 2))
+        best = (error, error, None, None)
+        if len(box) < 2:
+            return best
+        for channel in range(3):
+            ordered = box[np.argsort(means[box, channel], kind='stable')]
+            w = weights[ordered]
+            wx = w[:, None] * means[ordered]
+            wxx = np.sum(wx * means[ordered], axis=1)
+            left_w, left_wx, left_wxx = np.cumsum(w)[:-1], np.cumsum(wx, axis=0)[:-1], np.cumsum(wxx)[:-1]
+            right_w, right_wx, right_wxx = w.sum() - left_w, wx.sum(axis=0) - left_wx, wxx.sum() - left_wxx
+            remaining = (left_wxx - np.sum(left_wx ** 2, axis=1) / left_w) + (right_wxx - np.sum(right_wx ** 2, axis=1) / right_w)
+            cut = int(np.argmin(remaining)) + 1
+            if remaining[cut - 1] < best[1]:
+                best = (error, float(remaining[cut - 1]), ordered[:cut], ordered[cut:])
+        return best
+
+    boxes = [np.arange(len(occupied))]
+    cuts = [best_cut(boxes[0])]
+    while len(boxes) < k:
+        # Cut the box where it removes the most error
+        index = int(np.argmax([error - remaining for error, remaining, _, _ in cuts]))
+        _, _, left, right = cuts[index]
+        if left is None:
+            # Every box is a single color, the remaining clusters stay empty
+            break
+        boxes[index:index + 1] = [left, right]
+        cuts[index:index + 1] = [best_cut(left), best_cut(right)]
+
+    bin_labels = np.zeros(size, dtype=np.int32)
+    centers = np.zeros((k, 3), dtype=np.float32)
+    for label, box in enumerate(boxes):
+        bin_labels[occupied[box]] = label
+        centers[label] = np.average(means[box], axis=0, weights=weights[box])
+    centers[len(boxes):] = centers[len(boxes) - 1]
+    return bin_labels[bins].reshape(-1, 1), centers
+
+def refine_kmeans(pixels, labels, k, stats=None):
+    # A single k-means pass starting from the given labels, cv2 needs at least two iterations to check convergence
+    criteria = (cv2.TERM_CRITERIA_MAX_ITER, 1, 0)
+    compactness, labels, centers = cv2.kmeans(np.ascontiguousarray(pixels, dtype=np.float32), k, labels, criteria, 1, cv2.KMEANS_USE_INITIAL_LABELS)
+    if stats is not None:
+        stats.update(compactness=float(compactness), fit_points=len(pixels), iterations=None)
+    return labels, centers
+
+def pack_colors(pixels):
+    # One uint32 code per pixel, 0xRRGGBB
+    rgb = np.asarray(pixels).reshape(-1, 3).astype(np.uint32)
+    return (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+
+def unpack_colors(codes):
+    codes = np.asarray(codes, dtype=np.uint32)
+    return np.stack([(codes >> 16) & 0xFF, (codes >> 8) & 0xFF, codes & 0xFF], axis=1).astype(np.float32)
+
+def color_histogram(codes):
+    # Returns (unique_codes, counts, inverse) where unique_codes[inverse] == codes
+    if len(codes) >= DENSE_HISTOGRAM_PIXELS:
+        counts = np.bincount(codes, minlength=1 << 24)
+        unique_codes = np.flatnonzero(counts).astype(np.uint32)
+        lookup = np.empty(1 << 24, dtype=np.int32)
+        lookup[unique_codes] = np.arange(len(unique_codes), dtype=np.int32)
+        return unique_codes, counts[unique_codes], lookup[codes]
+    unique_codes, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+    return unique_codes, counts, inverse.astype(np.int32).ravel()
+
+def cluster_unique_colors(pixels, k, seed=None, initial_centers=None, stats=None):
+    # Cluster each distinct color once, weighted by how many pixels use it
+    unique_codes, counts, inverse = color_histogram(pack_colors(pixels))
+    colors = unpack_colors(unique_codes)
+
+    if len(colors) <= k and initial_centers is None:
+        # Fewer colors than clusters, every color is its own center and the rest stay empty.
+        # A warm start still goes through k-means so the clusters keep the order of the given palette
+        centers = np.zeros((k, 3), dtype=np.float32)
+        centers[:len(colors)] = colors
+        centers[len(colors):] = colors[-1]
+        color_labels = np.arange(len(colors), dtype=np.int32)
+        if stats is not None:
+            stats.update(compactness=0.0, fit_points=len(colors), iterations=0)
+    else:
+        color_labels, centers = weighted_kmeans(colors, counts.astype(np.float64), k, seed=seed, initial_centers=initial_centers, stats=stats)
+
+    labels = color_labels[inverse].reshape(-1, 1)
+    return labels, centers
+
+def weighted_kmeans(points, weights, k, criteria=KMEANS_CRITERIA, attempts=KMEANS_ATTEMPTS, seed=None, initial_centers=None, stats=None):
+    # Lloyd's k-means with per-point weights, stopping rules follow cv2 criteria (max_iter, eps)
+    rng = np.random.default_rng(seed)
+    max_iter, eps = criteria[1], criteria[2]
+    best_compactness, best_labels, best_centers, best_iterations = None, None, None, 0
+    if initial_centers is not None:
+        attempts = 1
+
+    for _ in range(attempts):
+        if initial_centers is not None:
+            centers = np.array(initial_centers, dtype=np.float32)
+        else:
+            centers = _weighted_kmeans_pp(points, weights, k, rng)
+        for iterations in range(1, max_iter + 1):
+            labels = assign_labels(points, centers).ravel()
+            sums = np.stack([np.bincount(labels, weights=weights * points[:, channel], minlength=k) for channel in range(3)], axis=1)
+            totals = np.bincount(labels, weights=weights, minlength=k)
+
+            new_centers = centers.copy()
+            filled = totals > 0
+            new_centers[filled] = (sums[filled] / totals[filled, None]).astype(np.float32)
+            shift = np.max(np.linalg.norm(new_centers - centers, axis=1))
+            centers = new_centers
+            if shift <= eps:
+                break
+
+        labels = assign_labels(points, centers).ravel()
+        diff = points - centers[labels]
+        compactness = float(np.sum(weights * np.einsum('ij,ij->i', diff, diff)))
+        if best_compactness is None or compactness < best_compactness:
+            best_compactness, best_labels, best_centers, best_iterations = compactness, labels, centers, iterations
+
+    if stats is not None:
+        stats.update(compactness=best_compactness, fit_points=len(points), iterations=best_iterations)
+    return best_labels.astype(np.int32), best_centers
+
+def _weighted_kmeans_pp(points, weights, k, rng):
+    # k-means++ seeding where the pick probability is weight x squared distance
+    centers = np.empty((k, 3), dtype=np.float32)
+    centers[0] = points[rng.choice(len(points), p=weights / weights.sum())]
+    closest = np.einsum('ij,ij->i', points - centers[0], points - centers[0])
+    for index in range(1, k):
+        scores = weights * closest
+        total = scores.sum()
+        if total <= 0:
+            centers[index:] = centers[index - 1]
+            break
+        centers[index] = points[rng.choice(len(points), p=scores / total)]
+        diff = points - centers[index]
+        closest = np.minimum(closest, np.einsum('ij,ij->i', diff, diff))
+    return centers
+
+def select_k(sample, k_range=K_RANGE, method='elbow', workers=None, seed=None):
+    # Fit every candidate k on the same sample in parallel (cv2.kmeans releases the GIL, so threads are enough)
+    # and score it. Returns {"k", "method", "scores": [{"k", "inertia", "silhouette"}]} so the pick can be audited.
+    if method not in K_SELECTION_METHODS:
+        raise ValueError(f"Unknown k selection method {method}, expected one of {K_SELECTION_METHODS}")
+    sample = np.ascontiguousarray(sample, dtype=np.float32)
+    low, high = k_range
+    candidates = [k for k in range(max(2, low), high + 1) if k <= len(sample)]
+    if not candidates:
+        raise ValueError(f"No candidate k in {k_range} for {len(sample)} sampled pixels")
+    if seed is not None:
+        cv2.setRNGSeed(seed)
+
+    subset = sample_pixels(sample, SILHOUETTE_SAMPLE_SIZE, 'random', seed) if method == 'silhouette' else None
+
+    def score(k):
+        compactness, _, centers = cv2.kmeans(sample, k, None, KMEANS_CRITERIA, K_SELECTION_ATTEMPTS, cv2.KMEANS_PP_CENTERS)
+        row = {"k": k, "inertia": float(compactness), "silhouette": None}
+        if subset is not None:
+            row["silhouette"] = silhouette_score(subset, assign_labels(subset, centers).ravel())
+        return row
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        scores = list(executor.map(score, candidates))
+
+    if method == 'silhouette':
+        best = max(scores, key=lambda row: row["silhouette"])["k"]
+    else:
+        best = elbow_k(scores)
+    return {"k": best, "method": method, "sample_size": len(sample), "scores": scores}
+
+def elbow_k(scores):
+    # Knee of the inertia curve: the point furthest below the line joining its first and last points
+    if len(scores) < 3:
+        return scores[0]["k"]
+    ks = np.array([row["k"] for row in scores], dtype=np.float64)
+    inertia = np.array([row["inertia"] for row in scores], dtype=np.float64)
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    spread = inertia.max() - inertia.min()
+    if spread <= 0:
+        return scores[0]["k"]
+    y = (inertia - inertia.min()) / spread
+    return int(ks[np.argmax(1.0 - x - y)])
+
+def silhouette_score(points, labels):
+    # Mean silhouette over points, single-member clusters score 0
+    distances = np.sqrt(np.maximum(0.0, np.einsum('ij,ij->i', points, points)[:, None] - 2.0 * points @ points.T + np.einsum('ij,ij->i', points, points)[None, :]))
+    clusters = np.unique(labels)
+    if len(clusters) < 2:
+        return 0.0
+    members = labels[None, :] == clusters[:, None]
+    counts = members.sum(axis=1)
+    # Mean distance from every point to every cluster
+    cluster_means = (distances @ members.T) / counts[None, :]
+    own = np.searchsorted(clusters, labels)
+    own_counts = counts[own]
+    a = cluster_means[np.arange(len(points)), own] * own_counts / np.maximum(own_counts - 1, 1)
+    cluster_means[np.arange(len(points)), own] = np.inf
+    b = cluster_means.min(axis=1)
+    silhouette = np.where(own_counts > 1, (b - a) / np.maximum(np.maximum(a, b), 1e-12), 0.0)
+    return float(silhouette.mean())
+
+def print_k_selection(selection):
+    print(f"Automatic k ({selection['method']}, {selection['sample_size']} sampled pixels): picked k={selection['k']}")
+    print(f"{'k':>4} {'inertia':>16} {'silhouette':>11}")
+    for row in selection["scores"]:
+        silhouette = f"{row['silhouette']:.4f}" if row["silhouette"] is not None else "-"
+        marker = " <" if row["k"] == selection["k"] else ""
+        print(f"{row['k']:>4} {row['inertia']:>16.0f} {silhouette:>11}{marker}")
+
+def compute_inertia(pixels, labels, centers):
+    # Sum of squared distances to the assigned centers, same measure as cv2.kmeans compactness
+    centers = np.asarray(centers, dtype=np.float32)
+    flat_labels = labels.ravel()
+    inertia = 0.0
+    for start in range(0, len(pixels), ASSIGN_CHUNK_SIZE):
+        chunk = np.asarray(pixels[start:start + ASSIGN_CHUNK_SIZE], dtype=np.float32)
+        diff = chunk - centers[flat_labels[start:start + len(chunk)]]
+        inertia += float(np.einsum('ij,ij->', diff, diff, dtype=np.float64))
+    return inertia
+
+def sample_quality_report(image_path, k=8, sample_sizes=(10000, 50000, 200000), sample_method='random', seed=None):
+    # Compare sampled fits against the full fit so a sample size can be picked per texture set
+    image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Could not read image at {image_path}")
+    pixels = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).reshape(-1, 3).astype(np.float32)
+
+    start = time.perf_counter()
+    labels, centers = cluster_pixels(pixels, k)
+    full_seconds = time.perf_counter() - start
+    full_inertia = compute_inertia(pixels, labels, centers)
+
+    rows = [{"sample_size": len(pixels), "seconds": full_seconds, "inertia": full_inertia, "inertia_ratio": 1.0, "speedup": 1.0}]
+    for sample_size in sample_sizes:
+        start = time.perf_counter()
+        labels, centers = cluster_pixels(pixels, k, sample_size, sample_method, seed)
+        seconds = time.perf_counter() - start
+        inertia = compute_inertia(pixels, labels, centers)
+        rows.append({
+            "sample_size": min(sample_size, len(pixels)),
+            "seconds": seconds,
+            "inertia": inertia,
+            "inertia_ratio": inertia / full_inertia if full_inertia > 0 else 1.0,
+            "speedup": full_seconds / seconds if seconds > 0 else float('inf'),
+        })
+
+    print(f"Sampled fit quality for {image_path} (k={k}, {sample_method} sampling)")
+    print(f"{'sample':>10} {'seconds':>9} {'speedup':>8} {'inertia':>16} {'vs full':>8}")
+    for row in rows:
+        print(f"{row['sample_size']:>10} {row['seconds']:>9.3f} {row['speedup']:>7.1f}x {row['inertia']:>16.0f} {row['inertia_ratio']:>8.4f}")
+    return rows
+
+def _init_worker():
+    # Each worker owns one texture, keep OpenCV from spawning its own threads on top of the pool
+    cv2.setNumThreads(1)
+
+def _quantize_worker(image_path, k, options):
+    start = time.perf_counter()
+    options = dict(options)
+    if options.pop("label_map", False):
+        options["label_path"] = label_map_path(image_path)
+    report = RunReport(image_path, k, options.get("engine", 'kmeans'))
+    try:
+        centers = quantize_headless(image_path, k, report=report, **options)
+    except Exception as e:
+        return {"path": image_path, "ok": False, "seconds": time.perf_counter() - start, "error": str(e), "report": report.to_dict()}
+    return {"path": image_path, "ok": True, "seconds": time.perf_counter() - start, "centers": len(centers), "report": report.to_dict()}
+
+def quantize_batch(image_paths, k=8, workers=None, report_path=None, **options):
+    # Quantize many textures on a process pool, one texture per task
+    # options are forwarded to quantize_colors, label_map=True gives every texture its own label file
+    # report_path collects one JSON line per texture
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [executor.submit(_quantize_worker, path, k, options) for path in image_paths]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if report_path:
+                append_json_line(report_path, dict(result["report"], ok=result["ok"], error=result.get("error")))
+            if result["ok"]:
+                print(f"[ok]     {result['path']} ({result['centers']} colors, {result['seconds']:.2f}s)")
+            else:
+                print(f"[failed] {result['path']}: {result['error']}")
+
+    succeeded = sum(1 for result in results if result["ok"])
+    total_seconds = sum(result["seconds"] for result in results)
+    print(f"Converted {succeeded}/{len(results)} textures, {total_seconds:.2f}s of worker time")
+    return results
+
+def parse_k(value):
+    if value == AUTO_K:
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer or '{AUTO_K}', got {value}")
 
 def main():
     parser = argparse.ArgumentParser(description="Color quantization using K-means clustering")
-    parser.add_argument("image_path", type=str, help="Path to the input PNG image")
-    parser.add_argument("-k", "--colors", type=int, default=8, help="Number of colors to quantize to (default: 8)")
+    parser.add_argument("image_paths", type=str, nargs="+", help="Input images, directories or glob patterns")
+    parser.add_argument("-k", "--colors", type=parse_k, default=8, help="Number of colors to quantize to, or 'auto' to pick it per texture (default: 8)")
+    parser.add_argument("--k-range", type=int, nargs=2, default=K_RANGE, metavar=("MIN", "MAX"), help="Candidate k values for -k auto (default: 2 21)")
+    parser.add_argument("--k-method", choices=K_SELECTION_METHODS, default='elbow', help="How -k auto scores the candidates (default: elbow)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes for batch mode (default: CPU count)")
+    parser.add_argument("-s", "--sample-size", type=int, default=None, help="Fit k-means on this many sampled pixels, then label the full image")
+    parser.add_argument("--sample-method", choices=SAMPLE_METHODS, default='random', help="How to pick the sampled pixels (default: random)")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default='kmeans', help="kmeans clusters every pixel, histogram clusters each distinct color once, mediancut is a deterministic single pass, mediancut_refined adds one k-means pass (default: kmeans)")
+    parser.add_argument("-t", "--tile-size", type=int, default=None, help="Stream the texture in bands of this many rows to bound memory on 8K+ textures")
+    parser.add_argument("--label-map", action="store_true", help="Keep the labels in <image>_Labels.npy and the palette in <image>_Palette.txt, for remask.py")
+    parser.add_argument("--cache", action="store_true", help="Reuse palettes and label maps from earlier runs on the same pixels")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Cache location (default: per-user cache folder)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_BYTES >> 20, help="Cache size limit in MB before old entries are evicted")
+    parser.add_argument("--headless", action="store_true", help="No preview windows and no key press to finish, for farm nodes and scripts")
+    parser.add_argument("--preview-dir", type=str, default=None, help=f"Write {PREVIEW_SIZE}x{PREVIEW_SIZE} previews of the clustered image and masks to this folder")
+    parser.add_argument("--seed", type=int, default=None, help="Fix the random seed for reproducible runs and benchmarks")
+    parser.add_argument("--init-palette", type=str, default=None, help="Warm-start from a _Palette.txt file or a sibling texture's palette, with a single k-means attempt")
+    parser.add_argument("--save-palette", action="store_true", help="Write the palette to <image>_Palette.txt for later warm starts")
+    parser.add_argument("--mask-layout", choices=tuple(MASK_CHANNELS), default='rgb', help="rgb: three clusters per _Mask_N.png, rgba: four clusters per RGBA mask (default: rgb)")
+    parser.add_argument("--png-compression", type=int, choices=range(10), default=None, metavar="0-9", help="PNG zlib level for the masks, lower is faster and bigger (default: OpenCV's own setting)")
+    parser.add_argument("--mip-levels", type=int, default=0, help="Also write this many halved mask levels as <image>_Mask_N_MipL.png, from the same clustering (default: 0)")
+    parser.add_argument("--report", type=str, default=None, help="Append a JSON line per texture with stage timings, clustering stats and bytes written")
+    parser.add_argument("--sample-report", type=int, nargs="+", metavar="SIZE", help="Compare sampled fits of these sizes against the full fit and exit")
     
     args = parser.parse_args()
-    
-    quantize_colors(args.image_path, args.colors)
+
+    image_paths = collect_image_paths(args.image_paths)
+    is_batch = len(image_paths) > 1 or any(os.path.isdir(p) or glob.has_magic(p) for p in args.image_paths)
+    if not image_paths:
+        parser.error("no input images found")
+    if args.tile_size and (args.cache or args.cache_dir):
+        parser.error("--tile-size can't be combined with --cache or --cache-dir, tiled runs don't hold the whole label map")
+    if args.colors == AUTO_K and (args.sample_report or args.init_palette):
+        parser.error("-k auto can't be combined with --sample-report or --init-palette, they need a fixed k")
+
+    if args.sample_report:
+        for image_path in image_paths:
+            sample_quality_report(image_path, args.colors, args.sample_report, args.sample_method, args.seed)
+        return
+
+    options = {"sample_size": args.sample_size, "sample_method": args.sample_method, "engine": args.engine, "tile_size": args.tile_size, "preview_dir": args.preview_dir, "seed": args.seed, "save_palette": args.save_palette, "k_range": tuple(args.k_range), "k_method": args.k_method, "mask_layout": args.mask_layout, "png_compression": args.png_compression, "mip_levels": args.mip_levels}
+    if args.init_palette:
+        options["initial_centers"] = resolve_initial_centers(args.init_palette, args.colors, args.seed)
+    if args.cache or args.cache_dir:
+        options["cache"] = PaletteCache(args.cache_dir, args.cache_size << 20)
+    if is_batch:
+        quantize_batch(image_paths, args.colors, args.jobs, args.report, label_map=args.label_map, **options)
+    else:
+        label_path = label_map_path(image_paths[0]) if args.label_map else None
+        report = RunReport()
+        if args.headless:
+            quantize_headless(image_paths[0], args.colors, verbose=True, label_path=label_path, report=report, **options)
+        else:
+            quantize_colors(image_paths[0], args.colors, label_path=label_path, report=report, **options)
+        print(report.summary())
+        if args.report:
+            append_json_line(args.report, report.to_dict())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
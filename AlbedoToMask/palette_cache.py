@@ -0,0 +1,98 @@
+import hashlib
+import os
+import tempfile
+import numpy as np
+
+# 2 GB of cached label maps before the least recently used entries are evicted
+DEFAULT_CACHE_BYTES = 2 << 30
+
+def default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'AlbedoToMask', 'palette_cache')
+
+class PaletteCache:
+    # On-disk cache of k-means results keyed by image content and clustering parameters.
+    # Each entry is one compressed .npz holding the centers and the label map; entries are
+    # touched on every hit and the oldest ones are evicted once the cache grows past max_bytes.
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_CACHE_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(image, k, criteria, attempts, **params):
+        # Hash of the decoded pixels, so re-saving the same albedo still hits
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((image.shape, str(image.dtype), k, tuple(criteria), attempts, sorted(params.items()))).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    def get(self, key):
+        # Returns (labels, centers) in the cv2.kmeans layout, or None on a miss
+        path = self._entry_path(key)
+        try:
+            with np.load(path) as entry:
+                labels = entry['labels'].astype(np.int32).reshape(-1, 1)
+                centers = entry['centers'].astype(np.float32)
+        except (OSError, KeyError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return labels, centers
+
+    def put(self, key, labels, centers):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        k = len(centers)
+        labels = np.asarray(labels).ravel().astype(np.uint8 if k <= 256 else np.int32)
+        path = self._entry_path(key)
+        # A unique temp file per writer, GUI worker threads share one process
+        handle, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez_compressed(file, labels=labels, centers=np.asarray(centers, dtype=np.float32))
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        # Drop least recently used entries until the cache fits in max_bytes
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith('.npz'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        max_bytes = self.max_bytes
+        self.max_bytes = 0
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
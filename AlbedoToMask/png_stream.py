@@ -0,0 +1,69 @@
+import struct
+import zlib
+import numpy as np
+
+# Same default as cv2.imwrite (IMWRITE_PNG_COMPRESSION = 1)
+PNG_COMPRESSION = 1
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+COLOR_TYPES = {1: 0, 3: 2, 4: 6}  # channels -> PNG color type (gray, RGB, RGBA)
+
+class PngStreamWriter:
+    # Writes an 8-bit PNG a band of rows at a time, so the full image never has to be in memory.
+    # Rows are given in file order (RGB / RGBA), not OpenCV's BGR.
+    def __init__(self, path, width, height, channels=3, compression=PNG_COMPRESSION):
+        if channels not in COLOR_TYPES:
+            raise ValueError(f"Unsupported channel count {channels}")
+        self.path = path
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rows_written = 0
+        self.bytes_written = 0
+        self._compressor = zlib.compressobj(compression)
+        self._file = open(path, 'wb')
+        self._file.write(PNG_SIGNATURE)
+        self.bytes_written += len(PNG_SIGNATURE)
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, COLOR_TYPES[channels], 0, 0, 0))
+
+    def write_rows(self, rows):
+        # rows: uint8 array of shape (n, width, channels) or (n, width) for gray
+        rows = rows.reshape(rows.shape[0], self.width * self.channels)
+        if self.rows_written + rows.shape[0] > self.height:
+            raise ValueError(f"Too many rows for {self.path}")
+        # Filter type 0 (None) in front of every scanline
+        filtered = np.zeros((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 1:] = rows
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._write_chunk(b'IDAT', data)
+        self.rows_written += rows.shape[0]
+
+    def close(self):
+        if self._file is None:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"{self.path} got {self.rows_written} of {self.height} rows")
+            self._write_chunk(b'IDAT', self._compressor.flush())
+            self._write_chunk(b'IEND', b'')
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack('>I', len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack('>I', zlib.crc32(data, zlib.crc32(chunk_type)) & 0xFFFFFFFF))
+        self.bytes_written += len(data) + 12
@@ -0,0 +1,55 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import color_quantization as cq
+from albedo_paths import LABEL_MAP_SUFFIX, is_generated_output, label_map_path
+
+def collect_label_maps(inputs):
+    # Label maps given directly, the label maps of given source textures, or every label map in a folder or glob
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            paths += sorted(glob.glob(os.path.join(glob.escape(entry), f"*{LABEL_MAP_SUFFIX}")))
+        elif glob.has_magic(entry):
+            # Like a folder, a pattern only picks up label maps that exist; our own masks never have one
+            matches = glob.glob(entry)
+            paths += sorted(path for path in matches if path.endswith(LABEL_MAP_SUFFIX))
+            paths += sorted(label_map_path(path) for path in matches if not path.endswith(LABEL_MAP_SUFFIX) and not is_generated_output(path) and os.path.isfile(label_map_path(path)))
+        else:
+            paths.append(entry if entry.endswith(LABEL_MAP_SUFFIX) else label_map_path(entry))
+    return list(dict.fromkeys(paths))
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild masks from saved label maps (color_quantization.py --label-map) without clustering again")
+    parser.add_argument("inputs", type=str, nargs="+", help="_Labels.npy files, their source textures, folders or glob patterns")
+    parser.add_argument("--mask-layout", choices=tuple(cq.MASK_CHANNELS), default='rgb', help="rgb: three clusters per mask, rgba: four clusters per mask (default: rgb)")
+    parser.add_argument("--order", type=int, nargs="+", default=None, metavar="CLUSTER", help="Clusters in channel order, e.g. 2 0 1 swaps channels; clusters left out get no mask channel")
+    parser.add_argument("--drop-partial", action="store_true", help="Skip the last mask when it would only be partly filled")
+    parser.add_argument("--first-mask-index", type=int, default=0, help="Number of the first _Mask_N.png (default: 0, the GUI counts from 1)")
+    parser.add_argument("--png-compression", type=int, choices=range(10), default=None, metavar="0-9", help="PNG zlib level for the masks")
+    parser.add_argument("--mip-levels", type=int, default=0, help="Also write this many halved mask levels as <image>_Mask_N_MipL.png (default: 0)")
+    parser.add_argument("-k", "--colors", type=int, default=None, help="Cluster count, when there is no _Palette.txt next to the source")
+    args = parser.parse_args()
+
+    label_paths = collect_label_maps(args.inputs)
+    if not label_paths:
+        parser.error("no label maps found")
+
+    failed = 0
+    for label_path in label_paths:
+        start = time.perf_counter()
+        try:
+            output_paths = cq.remask(label_path, args.mask_layout, args.order, not args.drop_partial, args.first_mask_index, args.png_compression, k=args.colors, verbose=False, mip_levels=args.mip_levels)
+        except (OSError, ValueError, IndexError) as e:
+            print(f"[failed] {label_path}: {e}")
+            failed += 1
+            continue
+        print(f"[ok]     {label_path} ({len(output_paths)} masks, {time.perf_counter() - start:.2f}s)")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
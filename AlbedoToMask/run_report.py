@@ -0,0 +1,74 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+class RunReport:
+    # Structured record of one conversion: stage timings, clustering stats and outputs.
+    # quantize_colors fills the report it is given; to_dict() is what ends up in the JSON lines file.
+    def __init__(self, image_path=None, k=None, engine=None):
+        self.image_path = image_path
+        self.k = k
+        self.engine = engine
+        self.width = None
+        self.height = None
+        self.pixels = None
+        self.stages = {}
+        self.stats = {}
+        self.outputs = []
+        self.bytes_written = 0
+        self.cache_hit = False
+        self.k_selection = None
+
+    @contextmanager
+    def stage(self, name):
+        # Time one stage, repeated stages with the same name add up
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def set_resolution(self, width, height):
+        self.width = width
+        self.height = height
+        self.pixels = width * height
+
+    def add_output(self, path):
+        self.outputs.append(path)
+        try:
+            self.bytes_written += os.path.getsize(path)
+        except OSError:
+            pass
+
+    @property
+    def total_seconds(self):
+        return sum(self.stages.values())
+
+    def to_dict(self):
+        return {
+            "path": self.image_path,
+            "k": self.k,
+            "engine": self.engine,
+            "width": self.width,
+            "height": self.height,
+            "pixels": self.pixels,
+            "stages": dict(self.stages),
+            "total_seconds": self.total_seconds,
+            "iterations": self.stats.get("iterations"),
+            "compactness": self.stats.get("compactness"),
+            "fit_points": self.stats.get("fit_points"),
+            "cache_hit": self.cache_hit,
+            "k_selection": self.k_selection,
+            "outputs": list(self.outputs),
+            "bytes_written": self.bytes_written,
+        }
+
+    def summary(self):
+        stages = " ".join(f"{name}={seconds:.3f}s" for name, seconds in self.stages.items())
+        return f"{self.image_path}: {self.width} x {self.height}, {stages}, {self.bytes_written} bytes written"
+
+def append_json_line(path, record):
+    # One JSON object per line so pipeline tools can aggregate many runs
+    with open(path, 'a') as file:
+        file.write(json.dumps(record) + "\n")
@@ -0,0 +1,251 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import color_quantization as cq
+from albedo_paths import IMAGE_EXTENSIONS, is_generated_output
+
+# One manifest per watched folder, paths inside it are relative to that folder so the folder can move
+MANIFEST_NAME = '.albedo_to_mask_manifest.json'
+MANIFEST_VERSION = 1
+
+# A save counts as finished once size and mtime have been stable this long
+DEFAULT_DEBOUNCE = 2.0
+DEFAULT_INTERVAL = 1.0
+
+HASH_CHUNK_SIZE = 1 << 20
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def scan_sources(folder):
+    # {path: (mtime_ns, size)} for every source texture under folder, generated masks and previews left out
+    sources = {}
+    for root, dirs, names in os.walk(folder):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in names:
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            if is_generated_output(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            sources[path] = (stat.st_mtime_ns, stat.st_size)
+    return sources
+
+class Manifest:
+    # source path -> {"hash", "mtime_ns", "size", "outputs"} for one watched folder, plus the settings
+    # the outputs were made with. Saved atomically after every change so a crash never loses finished work.
+    def __init__(self, folder, settings):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self.settings = settings
+        self.entries = {}
+        try:
+            with open(self.path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        for path, entry in data.get("sources", {}).items():
+            entry["outputs"] = [os.path.join(folder, output) for output in entry["outputs"]]
+            # Outputs made with other settings are stale, every texture gets redone
+            if data.get("settings") != settings:
+                entry["hash"] = None
+            self.entries[os.path.join(folder, path)] = entry
+
+    def get(self, path):
+        return self.entries.get(path)
+
+    def set(self, path, entry):
+        self.entries[path] = entry
+
+    def remove(self, path):
+        return self.entries.pop(path, None)
+
+    def save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "settings": self.settings,
+            "sources": {
+                os.path.relpath(path, self.folder): dict(entry, outputs=[os.path.relpath(output, self.folder) for output in entry["outputs"]])
+                for path, entry in sorted(self.entries.items())
+            },
+        }
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as file:
+            json.dump(data, file, indent=1)
+        os.replace(temp_path, self.path)
+
+class FolderWatcher:
+    # Polls folders for new or changed albedos and keeps their masks up to date on a process pool.
+    # Saves are debounced; a changed mtime alone only costs a hash, the texture is re-clustered
+    # only when its content changed. Outputs of deleted sources, and outputs a new run no longer
+    # makes, are removed, but only files the manifest recorded as ours.
+    def __init__(self, folders, k=8, workers=None, debounce=DEFAULT_DEBOUNCE, verbose=True, **options):
+        self.k = k
+        self.options = options
+        self.debounce = debounce
+        self.verbose = verbose
+        settings = {"k": k, **{name: value for name, value in options.items() if name != "cache"}}
+        self.manifests = {folder: Manifest(folder, json.loads(json.dumps(settings, default=str))) for folder in folders}
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=cq._init_worker)
+        # path -> ((mtime_ns, size), first time that stat was seen)
+        self.settling = {}
+        # future -> (manifest, path, hash, (mtime_ns, size))
+        self.running = {}
+        # path -> (mtime_ns, size) of a version that failed, it is only retried once the file changes
+        self.failed = {}
+
+    def log(self, message):
+        if self.verbose:
+            print(message, flush=True)
+
+    def poll(self):
+        # One pass: collect finished work, pick up settled changes and clean up after deleted sources
+        self.collect()
+        now = time.monotonic()
+        busy = {path for _, path, _, _ in self.running.values()}
+        for manifest in self.manifests.values():
+            sources = scan_sources(manifest.folder)
+            changed = False
+            for path in [path for path in manifest.entries if path not in sources and path not in busy]:
+                self.remove_outputs(manifest.remove(path)["outputs"])
+                self.settling.pop(path, None)
+                self.failed.pop(path, None)
+                self.log(f"[removed] {path}")
+                changed = True
+            for path, stat in sources.items():
+                if path in busy:
+                    continue
+                entry = manifest.get(path)
+                if entry is not None and (entry["mtime_ns"], entry["size"]) == stat and entry["hash"] is not None and self.outputs_exist(entry):
+                    self.settling.pop(path, None)
+                    continue
+                if self.failed.get(path) == stat:
+                    continue
+                self.failed.pop(path, None)
+                seen = self.settling.get(path)
+                if seen is None or seen[0] != stat:
+                    self.settling[path] = (stat, now)
+                    continue
+                if now - seen[1] < self.debounce:
+                    continue
+                del self.settling[path]
+                changed |= self.submit(manifest, path, stat)
+            if changed:
+                manifest.save()
+
+    def submit(self, manifest, path, stat):
+        # Returns True when only the manifest changed (same content, new mtime)
+        try:
+            content_hash = file_hash(path)
+        except OSError as e:
+            self.failed[path] = stat
+            self.log(f"[failed]  {path}: {e}")
+            return False
+        entry = manifest.get(path)
+        if entry is not None and entry["hash"] == content_hash and self.outputs_exist(entry):
+            # Touched or copied over with the same pixels, nothing to redo
+            manifest.set(path, dict(entry, mtime_ns=stat[0], size=stat[1]))
+            return True
+        future = self.executor.submit(cq._quantize_worker, path, self.k, self.options)
+        self.running[future] = (manifest, path, content_hash, stat)
+        self.log(f"[queued]  {path}")
+        return False
+
+    def collect(self):
+        for future in [future for future in self.running if future.done()]:
+            manifest, path, content_hash, stat = self.running.pop(future)
+            result = future.result()
+            if not result["ok"]:
+                # Keep the old entry, the next save of the file tries again
+                self.failed[path] = stat
+                self.log(f"[failed]  {path}: {result['error']}")
+                continue
+            outputs = result["report"]["outputs"]
+            previous = manifest.get(path)
+            if previous is not None:
+                self.remove_outputs([output for output in previous["outputs"] if output not in outputs])
+            manifest.set(path, {"hash": content_hash, "mtime_ns": stat[0], "size": stat[1], "outputs": outputs})
+            manifest.save()
+            self.log(f"[ok]      {path} ({len(outputs)} outputs, {result['seconds']:.2f}s)")
+
+    def outputs_exist(self, entry):
+        return all(os.path.isfile(output) for output in entry["outputs"])
+
+    def remove_outputs(self, outputs):
+        for output in outputs:
+            try:
+                os.remove(output)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.log(f"[warning] could not remove {output}: {e}")
+
+    def idle(self):
+        # Failed files never enter settling again until they change, so they count as settled
+        return not self.running and not self.settling
+
+    def run(self, interval=DEFAULT_INTERVAL, once=False):
+        # once: bring every folder up to date, wait for the pool and return instead of watching
+        try:
+            while True:
+                self.poll()
+                if once and self.idle():
+                    return
+                time.sleep(interval)
+        finally:
+            self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.collect()
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch folders and keep the AlbedoToMask masks of every albedo up to date")
+    parser.add_argument("folders", type=str, nargs="+", help="Folders to watch, including their subfolders")
+    parser.add_argument("-k", "--colors", type=int, default=8, help="Number of colors to quantize to (default: 8)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("-e", "--engine", choices=cq.ENGINES, default='kmeans', help="Clustering engine (default: kmeans)")
+    parser.add_argument("-s", "--sample-size", type=int, default=None, help="Fit the colors on this many sampled pixels")
+    parser.add_argument("--mask-layout", choices=tuple(cq.MASK_CHANNELS), default='rgb', help="rgb: three clusters per mask, rgba: four (default: rgb)")
+    parser.add_argument("--png-compression", type=int, choices=range(10), default=None, metavar="0-9", help="PNG zlib level for the masks")
+    parser.add_argument("--mip-levels", type=int, default=0, help="Also write this many halved mask levels (default: 0)")
+    parser.add_argument("--label-map", action="store_true", help="Also keep <image>_Labels.npy and <image>_Palette.txt for remask.py")
+    parser.add_argument("--seed", type=int, default=None, help="Fix the random seed")
+    parser.add_argument("--no-cache", action="store_true", help="Don't reuse cached clusterings when outputs have to be rebuilt")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE, help=f"Seconds a file must stay unchanged before it is processed (default: {DEFAULT_DEBOUNCE})")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help=f"Seconds between folder scans (default: {DEFAULT_INTERVAL})")
+    parser.add_argument("--once", action="store_true", help="Process what changed since the last run and exit")
+    args = parser.parse_args()
+
+    folders = [os.path.abspath(folder) for folder in args.folders]
+    for folder in folders:
+        if not os.path.isdir(folder):
+            parser.error(f"{folder} is not a folder")
+
+    options = {"engine": args.engine, "sample_size": args.sample_size, "mask_layout": args.mask_layout, "png_compression": args.png_compression, "label_map": args.label_map, "seed": args.seed, "mip_levels": args.mip_levels}
+    if not args.no_cache:
+        from palette_cache import PaletteCache
+        options["cache"] = PaletteCache()
+    watcher = FolderWatcher(folders, args.colors, args.jobs, 0 if args.once else args.debounce, **options)
+    print(f"Watching {', '.join(folders)}, Ctrl+C to stop", flush=True)
+    try:
+        watcher.run(args.interval, args.once)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+#guesses the asset type of a file from its content. FBX sniffing needs only the standard library,
+#PNG statistics decode a small thumbnail through Qt, which is loaded only when a PNG is classified
+
+#the Definitions section listing the object types of a binary or ASCII FBX sits near the start of the file
+FBX_HEADER_BYTES = 256 * 1024
+FBX_READ_CHUNK = 1024 * 1024
+#only rigged meshes have skin deformers or skeleton nodes
+FBX_SKELETAL_MARKERS = (b'Deformer', b'FbxSkeleton', b'LimbNode')
+
+PNG_THUMBNAIL_SIZE = 64
+#a tangent space normal map averages to about (128, 128, 255) and its pixels are unit vectors
+NORMAL_MAP_MIN_BLUE = 180
+NORMAL_MAP_MAX_RG_OFFSET = 40
+NORMAL_MAP_MAX_LENGTH_ERROR = 0.2
+#mask channels are almost all black or white, AlbedoToMask writes exactly 0 or 255
+MASK_LEVEL_TOLERANCE = 32
+MASK_MIN_EXTREME_RATIO = 0.9
+
+CLASSIFY_WORKERS = 8
+
+def classifyFbx(assetPath:str) -> str:
+    with open(assetPath, 'rb') as file:
+        header = file.read(FBX_HEADER_BYTES)
+        if any(marker in header for marker in FBX_SKELETAL_MARKERS):
+            return 'SKELETAL_MESH'
+        if b'Definitions' in header or len(header) < FBX_HEADER_BYTES:
+            return 'STATIC_MESH'
+        #no object type list in the first block, look through the rest of the file
+        tail = header[-16:]
+        for chunk in iter(lambda: file.read(FBX_READ_CHUNK), b''):
+            if any(marker in tail + chunk for marker in FBX_SKELETAL_MARKERS):
+                return 'SKELETAL_MESH'
+            tail = chunk[-16:]
+    return 'STATIC_MESH'
+
+def readPngThumbnail(assetPath:str) -> bytes:
+    #RGB bytes of a PNG_THUMBNAIL_SIZE thumbnail, decoded and scaled by Qt so Python only sees the small copy.
+    #nearest neighbour scaling keeps mask edges black or white instead of averaging them into grey
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QImage
+    image = QImage(assetPath)
+    if image.isNull():
+        raise OSError(f"Could not read {assetPath}")
+    image = image.scaled(PNG_THUMBNAIL_SIZE, PNG_THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.FastTransformation).convertToFormat(QImage.Format_RGB888)
+    rowBytes = image.width() * 3
+    data = image.constBits().asstring(image.bytesPerLine() * image.height())
+    return b''.join(data[y * image.bytesPerLine():y * image.bytesPerLine() + rowBytes] for y in range(image.height()))
+
+def classifyPixels(pixels:bytes) -> str:
+    red, green, blue = pixels[0::3], pixels[1::3], pixels[2::3]
+    count = len(red)
+    meanRed, meanGreen, meanBlue = sum(red) / count, sum(green) / count, sum(blue) / count
+    if meanBlue >= NORMAL_MAP_MIN_BLUE and abs(meanRed - 128) <= NORMAL_MAP_MAX_RG_OFFSET and abs(meanGreen - 128) <= NORMAL_MAP_MAX_RG_OFFSET:
+        lengthError = sum(abs(((r / 127.5 - 1) ** 2 + (g / 127.5 - 1) ** 2 + (b / 127.5 - 1) ** 2) ** 0.5 - 1) for r, g, b in zip(red, green, blue)) / count
+        if lengthError <= NORMAL_MAP_MAX_LENGTH_ERROR:
+            return 'NORMAL_MAP'
+    extremes = sum(1 for value in pixels if value <= MASK_LEVEL_TOLERANCE or value >= 255 - MASK_LEVEL_TOLERANCE)
+    if extremes >= MASK_MIN_EXTREME_RATIO * len(pixels):
+        return 'RGB_MASK'
+    return 'ALBEDO'
+
+def classifyAsset(assetPath:str) -> str:
+    #asset type name for one file, None for files that can't be classified
+    assetSuffix = os.path.splitext(assetPath)[1].lower()
+    try:
+        if assetSuffix == '.fbx':
+            return classifyFbx(assetPath)
+        if assetSuffix == '.png':
+            return classifyPixels(readPngThumbnail(assetPath))
+    except (OSError, ImportError) as e:
+        print(f"Could not classify {assetPath}: {e}")
+    return None
+
+def defaultCachePath() -> str:
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'RenamingTool', 'classification_cache.json')
+
+class ClassificationCache:
+    #asset type per absolute path, only valid while the file keeps its mtime and size
+    def __init__(self, cachePath:str = None):
+        self.cachePath = cachePath or defaultCachePath()
+        self.changed = False
+        try:
+            with open(self.cachePath) as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, assetPath:str, stat:tuple) -> str:
+        entry = self.entries.get(assetPath)
+        if entry is not None and (entry["mtime_ns"], entry["size"]) == stat:
+            return entry["type"]
+        return None
+
+    def put(self, assetPath:str, stat:tuple, assetTypeName:str):
+        self.entries[assetPath] = {"mtime_ns": stat[0], "size": stat[1], "type": assetTypeName}
+        self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.cachePath), exist_ok=True)
+        tempPath = f"{self.cachePath}.{os.getpid()}.tmp"
+        with open(tempPath, 'w') as file:
+            json.dump(self.entries, file)
+        os.replace(tempPath, self.cachePath)
+        self.changed = False
+
+def classifyAssets(assetPaths:list, cache:ClassificationCache = None, executor:ThreadPoolExecutor = None) -> dict:
+    #asset type name per path, files seen before with the same mtime and size come from the cache and the
+    #rest is classified on the executor (a temporary pool when none is given). Call cache.save() when done.
+    results = {}
+    pending = []
+    for assetPath in assetPaths:
+        try:
+            stat = os.stat(assetPath)
+        except OSError:
+            results[assetPath] = None
+            continue
+        key = os.path.normcase(os.path.abspath(assetPath))
+        stat = (stat.st_mtime_ns, stat.st_size)
+        cached = cache.get(key, stat) if cache is not None else None
+        if cached is not None:
+            results[assetPath] = cached
+        else:
+            pending.append((assetPath, key, stat))
+    if not pending:
+        return results
+
+    ownExecutor = executor is None
+    if ownExecutor:
+        executor = ThreadPoolExecutor(max_workers=CLASSIFY_WORKERS)
+    try:
+        for (assetPath, key, stat), assetTypeName in zip(pending, executor.map(classifyAsset, [assetPath for assetPath, _, _ in pending])):
+            results[assetPath] = assetTypeName
+            if cache is not None and assetTypeName is not None:
+                cache.put(key, stat, assetTypeName)
+    finally:
+        if ownExecutor:
+            executor.shutdown()
+    return results
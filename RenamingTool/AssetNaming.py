@@ -0,0 +1,65 @@
+import os
+from enum import Enum
+
+#only the standard library here, the naming rules are shared by the Qt window and the headless CLI
+
+class AssetType(Enum):
+    STATIC_MESH = 1
+    SKELETAL_MESH = 2
+    ALBEDO = 3
+    RGB_MASK = 4
+    NORMAL_MAP = 5
+
+#asset types offered for each file suffix, the first one is the default
+ASSET_TYPE_CHOICES = {
+    '.fbx': (AssetType.STATIC_MESH.name, AssetType.SKELETAL_MESH.name),
+    '.png': (AssetType.ALBEDO.name, AssetType.RGB_MASK.name, AssetType.NORMAL_MAP.name),
+}
+
+ASSET_TYPE_PREFIXES = {
+    AssetType.STATIC_MESH.name: 'SM_',
+    AssetType.SKELETAL_MESH.name: 'SKM_',
+    AssetType.ALBEDO.name: 'T_Albedo_',
+    AssetType.RGB_MASK.name: 'T_Mask_',
+    AssetType.NORMAL_MAP.name: 'T_Normal_',
+}
+
+def getAssetTypeChoices(assetPath:str) -> tuple:
+    assetSuffix = os.path.splitext(assetPath)[1]
+    return ASSET_TYPE_CHOICES.get(assetSuffix.lower(), ())
+
+def getAssetTypePrefix(assetTypeName:str) -> str:
+    if assetTypeName not in ASSET_TYPE_PREFIXES:
+        print("Error: invalid asset type")
+        return ''
+    return ASSET_TYPE_PREFIXES[assetTypeName]
+
+def isConventionedName(fileName:str) -> bool:
+    #already renamed by this tool, e.g. SM_Rock.fbx or T_Albedo_Rock_1.png
+    return fileName.startswith(tuple(ASSET_TYPE_PREFIXES.values()))
+
+def isRenamableAsset(fileName:str) -> bool:
+    return bool(getAssetTypeChoices(fileName)) and not isConventionedName(fileName)
+
+def scanAssetFolders(folderPaths:list):
+    #walks the folders depth first in name order with os.scandir and yields the renamable files of each folder
+    #as a list, already filtered on suffix and naming convention
+    pending = list(reversed(folderPaths))
+    while pending:
+        try:
+            entries = sorted(os.scandir(pending.pop()), key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Could not scan folder: {e}")
+            continue
+        subFolders = []
+        assetPaths = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subFolders.append(entry.path)
+                elif entry.is_file() and isRenamableAsset(entry.name):
+                    assetPaths.append(entry.path.replace(os.sep, '/'))
+            except OSError:
+                continue
+        pending.extend(reversed(subFolders))
+        yield assetPaths
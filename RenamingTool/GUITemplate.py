@@ -1,7 +1,7 @@
+import os
 from PyQt5 import QtWidgets
 from PyQt5 import QtCore
-import os
-from enum import Enum
+from AssetNaming import AssetType, getAssetTypeChoices
 
 class DropArea(QtWidgets.QLabel):
     def __init__(self):
@@ -76,12 +76,24 @@ class DropListWidget(QtWidgets.QListWidget):
         else:
             event.ignore()
 
-class AssetType(Enum):
-    STATIC_MESH = 1
-    SKELETAL_MESH = 2
-    ALBEDO = 3
-    RGB_MASK = 4
-    NORMAL_MAP = 5
+class DropTableView(QtWidgets.QTableView):
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.setAcceptDrops(True)
+        self.resize(600, 600)
+
+    def dragEnterEvent(self, e):
+        if e.mimeData().hasUrls():
+            e.accept()
+        else:
+            e.ignore()
+
+    def dragMoveEvent(self, e):
+        if e.mimeData().hasUrls():
+            e.setDropAction(QtCore.Qt.DropAction.CopyAction)
+            e.accept()
+        else:
+            e.ignore()
 
 class AssetTypeEntry(QtWidgets.QWidget):
     def __init__(self, assetPath : str, parent = None):
@@ -91,18 +103,11 @@ class AssetTypeEntry(QtWidgets.QWidget):
         self.labelAssetPath = QtWidgets.QLabel(assetPath)
         self.comboBoxAssetType = QtWidgets.QComboBox()
         
-        directory, assetSuffix = os.path.splitext(assetPath)
-        
-        if assetSuffix == '':
+        assetTypeNames = getAssetTypeChoices(assetPath)
+        if not assetTypeNames:
             print("No file suffix")
             return
-        if assetSuffix.lower() == '.fbx':
-            self.comboBoxAssetType.addItem(AssetType.STATIC_MESH.name)
-            self.comboBoxAssetType.addItem(AssetType.SKELETAL_MESH.name)
-        elif assetSuffix.lower() == '.png':
-            self.comboBoxAssetType.addItem(AssetType.ALBEDO.name)
-            self.comboBoxAssetType.addItem(AssetType.RGB_MASK.name)
-            self.comboBoxAssetType.addItem(AssetType.NORMAL_MAP.name)
+        self.comboBoxAssetType.addItems(assetTypeNames)
 
         #layout widgets
         self.hLayout = QtWidgets.QHBoxLayout()
@@ -119,6 +124,129 @@ class AssetTypeEntry(QtWidgets.QWidget):
     def setNewAssetPath(self, newPath:str):
         self.labelAssetPath.setText(newPath)
 
+def assetPathKey(assetPath:str) -> str:
+    #one spelling per file, so the same file dropped twice is recognized
+    return os.path.normcase(os.path.abspath(assetPath))
+
+class AssetTypeListModel(QtCore.QAbstractTableModel):
+    #asset path and asset type name per row, kept in two plain lists instead of one widget per file
+    #so thousands of dropped files only cost a few strings each
+    PATH_COLUMN = 0
+    TYPE_COLUMN = 1
+    HEADERS = ("Asset Path", "Asset Type")
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self._assetPaths = []
+        self._assetTypeNames = []
+        #rows whose type was picked by hand or that were renamed, guesses never overwrite them
+        self._userSetRows = set()
+        #normalized paths of the rows, dropping a file or folder again doesn't add it twice
+        self._assetPathKeys = set()
+
+    def rowCount(self, parent = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._assetPaths)
+
+    def columnCount(self, parent = QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role = QtCore.Qt.DisplayRole):
+        if orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role = QtCore.Qt.DisplayRole):
+        if not index.isValid() or role not in (QtCore.Qt.DisplayRole, QtCore.Qt.EditRole, QtCore.Qt.ToolTipRole):
+            return None
+        if index.column() == self.PATH_COLUMN:
+            return self._assetPaths[index.row()]
+        return self._assetTypeNames[index.row()]
+
+    def setData(self, index, value, role = QtCore.Qt.EditRole) -> bool:
+        if not index.isValid() or index.column() != self.TYPE_COLUMN or role != QtCore.Qt.EditRole:
+            return False
+        if value not in self.assetTypeChoices(index.row()):
+            return False
+        self._assetTypeNames[index.row()] = value
+        self._userSetRows.add(index.row())
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def setGuessedAssetTypeNames(self, guesses:list):
+        #(row, asset type name) pairs from automatic classification, one dataChanged for the whole batch
+        changedRows = []
+        for row, assetTypeName in guesses:
+            if row >= len(self._assetPaths) or row in self._userSetRows or assetTypeName not in self.assetTypeChoices(row):
+                continue
+            self._assetTypeNames[row] = assetTypeName
+            changedRows.append(row)
+        if changedRows:
+            self.dataChanged.emit(self.index(min(changedRows), self.TYPE_COLUMN), self.index(max(changedRows), self.TYPE_COLUMN), [QtCore.Qt.DisplayRole])
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == self.TYPE_COLUMN and self._assetTypeNames[index.row()]:
+            flags |= QtCore.Qt.ItemIsEditable
+        return flags
+
+    def addAssetPaths(self, assetPaths:list):
+        #one insert per batch so the view lays out once, not once per file
+        assetPaths = [assetPath for assetPath in dict.fromkeys(assetPaths) if assetPathKey(assetPath) not in self._assetPathKeys]
+        if not assetPaths:
+            return
+        first = len(self._assetPaths)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(assetPaths) - 1)
+        for assetPath in assetPaths:
+            assetTypeNames = getAssetTypeChoices(assetPath)
+            self._assetPaths.append(assetPath)
+            self._assetPathKeys.add(assetPathKey(assetPath))
+            self._assetTypeNames.append(assetTypeNames[0] if assetTypeNames else '')
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._assetPaths = []
+        self._assetTypeNames = []
+        self._userSetRows = set()
+        self._assetPathKeys = set()
+        self.endResetModel()
+
+    def assetTypeChoices(self, row:int) -> tuple:
+        return getAssetTypeChoices(self._assetPaths[row])
+
+    def getAssetPath(self, row:int) -> str:
+        return self._assetPaths[row]
+
+    def getAssetTypeName(self, row:int) -> str:
+        return self._assetTypeNames[row]
+
+    def setNewAssetPath(self, row:int, newPath:str):
+        self._assetPathKeys.discard(assetPathKey(self._assetPaths[row]))
+        self._assetPaths[row] = newPath
+        self._assetPathKeys.add(assetPathKey(newPath))
+        #the type is part of the new name now
+        self._userSetRows.add(row)
+        index = self.index(row, self.PATH_COLUMN)
+        self.dataChanged.emit(index, index, [QtCore.Qt.DisplayRole])
+
+class AssetTypeDelegate(QtWidgets.QStyledItemDelegate):
+    #a combo box only exists for the row being edited, every other row is painted as plain text
+    def createEditor(self, parent, option, index):
+        comboBox = QtWidgets.QComboBox(parent)
+        comboBox.addItems(index.model().assetTypeChoices(index.row()))
+        comboBox.activated.connect(lambda: self.commitAndCloseEditor(comboBox))
+        return comboBox
+
+    def setEditorData(self, editor, index):
+        editor.setCurrentText(index.data(QtCore.Qt.EditRole))
+
+    def setModelData(self, editor, model, index):
+        model.setData(index, editor.currentText(), QtCore.Qt.EditRole)
+
+    def commitAndCloseEditor(self, editor):
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor)
+
     
 class WindowTemplate(QtWidgets.QMainWindow):
     #properties
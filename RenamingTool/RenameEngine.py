@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
+
+#only the standard library here, so scripts can plan and apply renames without Qt
+
+#renames are I/O bound, on network shares most of the time is spent waiting for the server
+RENAME_WORKERS = 8
+JOURNAL_NAME = '.RenamingTool_journal.jsonl'
+
+class RenameError(Exception):
+    pass
+
+class RenamePlan:
+    #every rename of one batch, computed and checked before anything on disk changes
+    def __init__(self):
+        #(entry index, source path, target path)
+        self.renames = []
+        #sources that would end up on another source's path, they move through a temporary name first
+        self.staged = set()
+        self.conflicts = []
+
+    def isValid(self) -> bool:
+        return not self.conflicts
+
+def directoryKey(directory:str) -> str:
+    #'' and './' are the current folder, and a folder can be spelled in different ways
+    return os.path.normcase(os.path.abspath(directory or '.'))
+
+def planRenames(assetName:str, entries:list) -> RenamePlan:
+    #entries: (asset path, file prefix) per asset, in list order. The second asset with the same prefix
+    #gets _1, the third _2 and so on, exactly like renaming them one by one did.
+    plan = RenamePlan()
+    prefixCounts = {}
+    directoryIndex = {}
+    targets = {}
+    sourceKeys = set()
+    for entryIndex, (assetPath, filePrefix) in enumerate(entries):
+        #the same file listed twice would be renamed twice, the second rename can only fail
+        sourceKey = os.path.normcase(os.path.abspath(assetPath))
+        if sourceKey in sourceKeys:
+            plan.conflicts.append(f"{assetPath} is listed twice")
+            continue
+        sourceKeys.add(sourceKey)
+        directory, fileName = os.path.split(assetPath)
+        fileSuffix = os.path.splitext(fileName)[1]
+
+        #check for multiple assets of the same type
+        if prefixCounts.get(filePrefix, 0) > 0:
+            fileSuffix = '_' + str(prefixCounts[filePrefix]) + fileSuffix
+        prefixCounts[filePrefix] = prefixCounts.get(filePrefix, 0) + 1
+        targetPath = os.path.join(directory, f"{filePrefix}{assetName}{fileSuffix}")
+
+        #one listing per folder instead of a stat per file
+        folderKey = directoryKey(directory)
+        if folderKey not in directoryIndex:
+            try:
+                directoryIndex[folderKey] = {os.path.normcase(name) for name in os.listdir(directory or '.')}
+            except OSError:
+                directoryIndex[folderKey] = set()
+        if os.path.normcase(fileName) not in directoryIndex[folderKey]:
+            plan.conflicts.append(f"{assetPath} does not exist")
+            continue
+        targetKey = os.path.normcase(os.path.abspath(targetPath))
+        if targetKey in targets:
+            plan.conflicts.append(f"{assetPath} and {targets[targetKey]} would both become {targetPath}")
+            continue
+        targets[targetKey] = assetPath
+        plan.renames.append((entryIndex, assetPath, targetPath))
+
+    sources = {os.path.normcase(os.path.abspath(sourcePath)): entryIndex for entryIndex, sourcePath, _ in plan.renames}
+    for entryIndex, sourcePath, targetPath in plan.renames:
+        targetKey = os.path.normcase(os.path.abspath(targetPath))
+        if targetKey == os.path.normcase(os.path.abspath(sourcePath)):
+            continue
+        if targetKey in sources:
+            #the target is another source of this batch, which moves away first
+            plan.staged.add(sources[targetKey])
+        elif os.path.normcase(os.path.basename(targetPath)) in directoryIndex[directoryKey(os.path.dirname(targetPath))]:
+            plan.conflicts.append(f"{targetPath} already exists")
+    #renames that don't change the name have nothing to do
+    plan.renames = [rename for rename in plan.renames if rename[1] != rename[2]]
+    return plan
+
+def journalPathFor(plan:RenamePlan) -> str:
+    return os.path.join(os.path.dirname(plan.renames[0][1]) or '.', JOURNAL_NAME)
+
+def applyRenamePlan(plan:RenamePlan, journalPath:str = None, workers:int = RENAME_WORKERS) -> list:
+    #runs the renames on a thread pool. Every step is written to a journal before and after it runs, if one
+    #fails the finished steps are undone and RenameError is raised; after a crash rollbackJournal() undoes them.
+    #refuses to start while a journal of an unfinished batch is still there.
+    #returns the (entry index, source path, target path) renames that were done
+    if not plan.isValid():
+        raise RenameError(f"{len(plan.conflicts)} conflicts in the rename plan")
+    if not plan.renames:
+        return []
+
+    #staged sources move to a temporary name first, so swaps and chains work in any order
+    stagingNames = {entryIndex: f"{sourcePath}.{uuid.uuid4().hex[:8]}.renaming" for entryIndex, sourcePath, _ in plan.renames if entryIndex in plan.staged}
+    phases = [
+        [(sourcePath, stagingNames[entryIndex]) for entryIndex, sourcePath, _ in plan.renames if entryIndex in stagingNames],
+        [(stagingNames.get(entryIndex, sourcePath), targetPath) for entryIndex, sourcePath, targetPath in plan.renames],
+    ]
+    steps = [(phaseIndex, sourcePath, targetPath) for phaseIndex, phase in enumerate(phases) for sourcePath, targetPath in phase]
+
+    journalPath = journalPath or journalPathFor(plan)
+    journalLock = threading.Lock()
+    try:
+        journal = open(journalPath, 'x')
+    except FileExistsError:
+        raise RenameError(f"{journalPath} is left from a rename that did not finish, roll it back first") from None
+    with journal:
+        journal.write(json.dumps({"steps": steps}) + "\n")
+        journal.flush()
+        os.fsync(journal.fileno())
+
+        done = []
+        def renameStep(stepIndex):
+            _, sourcePath, targetPath = steps[stepIndex]
+            #the plan checked the target, this catches files that showed up since
+            if os.path.exists(targetPath) and not os.path.samefile(sourcePath, targetPath):
+                raise FileExistsError(f"{targetPath} already exists")
+            os.rename(sourcePath, targetPath)
+            with journalLock:
+                done.append(stepIndex)
+                journal.write(json.dumps({"done": stepIndex}) + "\n")
+                journal.flush()
+
+        error = None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            stepIndex = 0
+            for phase in phases:
+                futures = [executor.submit(renameStep, index) for index in range(stepIndex, stepIndex + len(phase))]
+                stepIndex += len(phase)
+                _, pending = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in pending:
+                    future.cancel()
+                wait(futures)
+                errors = [future.exception() for future in futures if not future.cancelled() and future.exception()]
+                if errors:
+                    error = errors[0]
+                    break
+
+    if error is not None:
+        failedRollbacks = rollbackJournal(journalPath, workers)
+        message = f"Rename failed, {len(done) - len(failedRollbacks)} finished renames undone: {error}"
+        if failedRollbacks:
+            message += f"; could not undo {len(failedRollbacks)}, journal kept at {journalPath}"
+        raise RenameError(message) from error
+    os.remove(journalPath)
+    return plan.renames
+
+def rollbackJournal(journalPath:str, workers:int = RENAME_WORKERS) -> list:
+    #undoes the finished steps of a journal, later phases first since they may have taken a path an earlier
+    #phase freed; returns the steps that could not be undone and removes the journal once everything is back.
+    #a crash between os.rename and the done line leaves a step unmarked, those count as done when their
+    #target exists and their source is gone
+    with open(journalPath) as journal:
+        lines = [json.loads(line) for line in journal if line.strip()]
+    if not lines or "steps" not in lines[0]:
+        raise RenameError(f"{journalPath} is not a rename journal")
+    steps = lines[0]["steps"]
+    done = {line["done"] for line in lines[1:] if "done" in line}
+    done |= {index for index, (_, sourcePath, targetPath) in enumerate(steps) if index not in done and os.path.exists(targetPath) and not os.path.exists(sourcePath)}
+    done = sorted(done, reverse=True)
+
+    failed = []
+    def undoStep(stepIndex):
+        _, sourcePath, targetPath = steps[stepIndex]
+        try:
+            os.rename(targetPath, sourcePath)
+        except OSError as e:
+            print(f"Could not undo {sourcePath} -> {targetPath}: {e}")
+            failed.append(stepIndex)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for phaseIndex in sorted({steps[index][0] for index in done}, reverse=True):
+            list(executor.map(undoStep, [index for index in done if steps[index][0] == phaseIndex]))
+    if not failed:
+        os.remove(journalPath)
+    return failed
@@ -0,0 +1,120 @@
+import argparse
+import fnmatch
+import glob
+import os
+import sys
+
+#headless renaming for build agents and ingestion scripts, never imports PyQt5
+from AssetNaming import AssetType, getAssetTypeChoices, getAssetTypePrefix, scanAssetFolders
+from RenameEngine import JOURNAL_NAME, RenameError, planRenames, applyRenamePlan, rollbackJournal
+
+def loadRules(rulePath:str) -> list:
+    #one "<pattern> <ASSET_TYPE>" per line, '#' starts a comment. Patterns are matched case-insensitively
+    #against the file name, or against the whole path when they contain a '/'; the first matching rule wins.
+    #    *_N.png         NORMAL_MAP
+    #    *_Mask*.png     RGB_MASK
+    #    */Characters/*  SKELETAL_MESH
+    rules = []
+    with open(rulePath) as file:
+        for lineNumber, line in enumerate(file, 1):
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.rsplit(None, 1)
+            if len(parts) != 2 or parts[1] not in AssetType.__members__:
+                raise ValueError(f"{rulePath}:{lineNumber}: expected '<pattern> <{'|'.join(AssetType.__members__)}>'")
+            rules.append((parts[0].lower(), parts[1]))
+    return rules
+
+def resolveAssetType(assetPath:str, rules:list) -> str:
+    #first rule that matches and names a type this suffix can have, otherwise the suffix default like in the window
+    assetTypeNames = getAssetTypeChoices(assetPath)
+    fileName = os.path.basename(assetPath).lower()
+    for pattern, assetTypeName in rules:
+        subject = assetPath.replace(os.sep, '/').lower() if '/' in pattern else fileName
+        if assetTypeName in assetTypeNames and fnmatch.fnmatchcase(subject, pattern):
+            return assetTypeName
+    return assetTypeNames[0] if assetTypeNames else ''
+
+def collectAssetPaths(inputs:list) -> list:
+    #files as given, folders scanned recursively (skipping names that already follow the convention), globs expanded.
+    #paths come back absolute like the ones dropped on the window, so the same file given twice is collected once
+    assetPaths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for folderAssetPaths in scanAssetFolders([entry]):
+                assetPaths += folderAssetPaths
+        elif glob.has_magic(entry):
+            assetPaths += sorted(path for path in glob.glob(entry, recursive=True) if os.path.isfile(path))
+        else:
+            assetPaths.append(entry)
+    return list(dict.fromkeys(os.path.abspath(path).replace(os.sep, '/') for path in assetPaths))
+
+def rollback(journalPath:str):
+    failedRollbacks = rollbackJournal(journalPath)
+    if failedRollbacks:
+        print(f"Could not undo {len(failedRollbacks)} renames, journal kept at {journalPath}")
+        sys.exit(1)
+    print(f"Undid the unfinished rename of {journalPath}")
+
+def renameAssets(args, parser):
+    try:
+        rules = loadRules(args.rules) if args.rules else []
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    entries = []
+    for assetPath in collectAssetPaths(args.inputs):
+        assetTypeName = resolveAssetType(assetPath, rules)
+        if assetTypeName == '':
+            print(f"Skipping {assetPath}: no asset type for this file")
+            continue
+        entries.append((assetPath, getAssetTypePrefix(assetTypeName)))
+    if not entries:
+        parser.error("no assets to rename")
+
+    plan = planRenames(args.assetName, entries)
+    if not plan.isValid():
+        for conflict in plan.conflicts:
+            print(f"Conflict: {conflict}")
+        print(f"{len(plan.conflicts)} conflicts, nothing renamed")
+        sys.exit(1)
+
+    for _, assetPath, newFilePath in plan.renames:
+        print(f"{assetPath} -> {newFilePath}")
+    if args.dry_run:
+        return
+    try:
+        renames = applyRenamePlan(plan, args.journal)
+    except RenameError as e:
+        print(e)
+        sys.exit(1)
+    print(f"Renamed {len(renames)} assets")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rename assets to the SM_/SKM_/T_Albedo_/T_Mask_/T_Normal_ convention without the Qt window")
+    parser.add_argument("assetName", type=str, nargs="?", help="Asset name, e.g. Rock gives SM_Rock.fbx and T_Albedo_Rock.png")
+    parser.add_argument("inputs", type=str, nargs="*", help="Files, folders (scanned recursively) or glob patterns")
+    parser.add_argument("-r", "--rules", type=str, default=None, help="Rule file mapping name patterns to asset types, one '<pattern> <ASSET_TYPE>' per line")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="Print the renames without touching any file")
+    parser.add_argument("--journal", type=str, default=None, help="Write-ahead journal location (default: next to the first asset)")
+    parser.add_argument("--rollback", type=str, default=None, metavar="JOURNAL", help=f"Undo a rename that did not finish from its journal ({JOURNAL_NAME}) and exit")
+    args = parser.parse_args()
+    if args.rollback is None and not args.inputs:
+        parser.error("an asset name and at least one input are required")
+
+    #a message instead of a traceback for anything that goes wrong
+    try:
+        if args.rollback is not None:
+            rollback(args.rollback)
+        else:
+            renameAssets(args, parser)
+    except (OSError, ValueError, RenameError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Unexpected error: {type(e).__name__}: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,168 @@
 from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QVBoxLayout, QLineEdit)
 from PyQt5.QtGui import QIcon
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from GUITemplate import *
+from AssetNaming import getAssetTypePrefix, scanAssetFolders
+from AssetClassifier import CLASSIFY_WORKERS, ClassificationCache, classifyAssets
+from RenameEngine import RenameError, planRenames, applyRenamePlan, journalPathFor, rollbackJournal
+
+#folder drops are scanned on a worker thread and added to the list in batches of this many files,
+#or whatever was found so far once this many seconds passed
+SCAN_BATCH_SIZE = 256
+SCAN_BATCH_SECONDS = 0.1
+
+class FolderScanWorker(QtCore.QThread):
+    #walks the dropped folders with os.scandir, only files the tool can rename and that don't already
+    #follow the naming convention are sent back, in batches as they are found
+    batchFound = QtCore.pyqtSignal(list)
+
+    def __init__(self, folderPaths:list, parent = None):
+        super().__init__(parent)
+        self.folderPaths = folderPaths
+
+    def run(self):
+        batch = []
+        lastEmit = time.monotonic()
+        for assetPaths in scanAssetFolders(self.folderPaths):
+            if self.isInterruptionRequested():
+                return
+            batch += assetPaths
+            if batch and (len(batch) >= SCAN_BATCH_SIZE or time.monotonic() - lastEmit >= SCAN_BATCH_SECONDS):
+                self.batchFound.emit(batch)
+                batch = []
+                lastEmit = time.monotonic()
+        if batch and not self.isInterruptionRequested():
+            self.batchFound.emit(batch)
+
+class AssetTypeDropTableView(DropTableView):
+    #True while dropped files still wait for their guessed asset type
+    classifyingChanged = QtCore.pyqtSignal(bool)
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.assetTypeModel = AssetTypeListModel(self)
+        self.setModel(self.assetTypeModel)
+        self.setItemDelegateForColumn(AssetTypeListModel.TYPE_COLUMN, AssetTypeDelegate(self))
+        self.scanWorkers = []
+        self.classifyGeneration = 0
+        self.classifyWorker = ClassifyWorker(self)
+        self.classifyWorker.batchClassified.connect(self.applyClassification)
+        self.classifyWorker.finished.connect(self.classifyFinished)
+        self.assetTypeModel.rowsInserted.connect(self.classifyRows)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.CurrentChanged | QtWidgets.QAbstractItemView.SelectedClicked)
+        self.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.setWordWrap(False)
+
+        #fixed row heights and column widths, so the view never measures all rows after a big drop
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(self.fontMetrics().height() + 8)
+        self.horizontalHeader().setSectionResizeMode(AssetTypeListModel.PATH_COLUMN, QtWidgets.QHeaderView.Stretch)
+        self.horizontalHeader().setSectionResizeMode(AssetTypeListModel.TYPE_COLUMN, QtWidgets.QHeaderView.Fixed)
+        self.horizontalHeader().resizeSection(AssetTypeListModel.TYPE_COLUMN, 160)
 
-class AssetTypeDropListWidget(DropListWidget):
     def dropEvent(self, event):
         if event.mimeData().hasUrls():
             event.setDropAction(QtCore.Qt.DropAction.CopyAction)
             event.accept()
 
-            for url in event.mimeData().urls():
-                if url.isLocalFile():
-                    assetTypeEntry = AssetTypeEntry(str(url.toLocalFile()))
-                    item = QtWidgets.QListWidgetItem()
-                    item.setSizeHint(assetTypeEntry.sizeHint())
-                    self.addItem(item)
-                    self.setItemWidget(item, assetTypeEntry)
-                    
-                    event.accept()
-                else:
-                    event.ignore()
-        
+            assetPaths = [str(url.toLocalFile()) for url in event.mimeData().urls() if url.isLocalFile()]
+            folderPaths = [assetPath for assetPath in assetPaths if os.path.isdir(assetPath)]
+            filePaths = [assetPath for assetPath in assetPaths if assetPath not in set(folderPaths)] if folderPaths else assetPaths
+            self.assetTypeModel.addAssetPaths(filePaths)
+            if folderPaths:
+                self.scanFolders(folderPaths)
         else:
             event.ignore()
 
+    def scanFolders(self, folderPaths:list):
+        worker = FolderScanWorker(folderPaths, self)
+        worker.batchFound.connect(self.assetTypeModel.addAssetPaths)
+        worker.finished.connect(lambda: self.scanWorkers.remove(worker))
+        worker.finished.connect(worker.deleteLater)
+        self.scanWorkers.append(worker)
+        worker.start()
+
+    def clear(self):
+        #stop running scans first so their remaining batches don't refill the list. Stopped scans stay in
+        #scanWorkers until they finish, a second Clear before that must not disconnect them again
+        for worker in self.scanWorkers:
+            if worker.isInterruptionRequested():
+                continue
+            worker.requestInterruption()
+            worker.batchFound.disconnect()
+        self.classifyGeneration += 1
+        self.classifyWorker.discardPending()
+        self.assetTypeModel.clear()
+
+    def stopWorkers(self):
+        #threads still running when the window goes away would abort the application
+        for worker in list(self.scanWorkers):
+            worker.requestInterruption()
+            worker.wait()
+        self.classifyWorker.discardPending()
+        self.classifyWorker.wait()
+
+    def classifyRows(self, parent, first:int, last:int):
+        rows = [(row, self.assetTypeModel.getAssetPath(row)) for row in range(first, last + 1) if self.assetTypeModel.getAssetTypeName(row)]
+        if rows:
+            self.classifyWorker.enqueue(self.classifyGeneration, rows)
+            self.classifyingChanged.emit(True)
+
+    def classifyFinished(self):
+        #a new drop may have restarted the worker before this queued signal arrived
+        if not self.classifyWorker.isRunning():
+            self.classifyingChanged.emit(False)
+
+    def applyClassification(self, generation:int, results:list):
+        if generation == self.classifyGeneration:
+            self.assetTypeModel.setGuessedAssetTypeNames(results)
+
+class ClassifyWorker(QtCore.QThread):
+    #guesses asset types from file content for rows as they are added. Rows queue up while the thread runs,
+    #it exits once the queue is empty and enqueue() starts it again. Results come back as (generation, [(row, type)]),
+    #the view bumps its generation on clear so results for rows that are gone get dropped
+    batchClassified = QtCore.pyqtSignal(int, list)
+
+    def __init__(self, parent = None):
+        super().__init__(parent)
+        self.lock = threading.Lock()
+        self.pending = []
+        self.active = False
+        self.cache = None
+
+    def enqueue(self, generation:int, rows:list):
+        with self.lock:
+            #small chunks, so discardPending() takes effect soon even after a huge drop
+            self.pending += [(generation, rows[start:start + SCAN_BATCH_SIZE]) for start in range(0, len(rows), SCAN_BATCH_SIZE)]
+            if self.active:
+                return
+            self.active = True
+        #the previous run may still be returning
+        self.wait()
+        self.start()
+
+    def discardPending(self):
+        with self.lock:
+            self.pending = []
+
+    def run(self):
+        if self.cache is None:
+            self.cache = ClassificationCache()
+        with ThreadPoolExecutor(max_workers=CLASSIFY_WORKERS) as executor:
+            while True:
+                with self.lock:
+                    if not self.pending:
+                        self.active = False
+                        break
+                    generation, rows = self.pending.pop(0)
+                results = classifyAssets([assetPath for _, assetPath in rows], self.cache, executor)
+                self.batchClassified.emit(generation, [(row, results[assetPath]) for row, assetPath in rows if results[assetPath]])
+        self.cache.save()
+
 class RenamingWindow(WindowTemplate):
     _titleName = 'Renaming Tool'
     _windowSize = QtCore.QSize(800, 600)
@@ -31,10 +170,14 @@ class RenamingWindow(WindowTemplate):
     def __init__(self):
         super().__init__()
 
+    def closeEvent(self, event):
+        self.dropTableViewFiles.stopWorkers()
+        super().closeEvent(event)
+
     def createWidgets(self):
         self.labelNameInstruction = QtWidgets.QLabel("Type in the asset name")
         self.lineEditAssetName = QtWidgets.QLineEdit()
-        self.dropListWidgetFiles = AssetTypeDropListWidget()
+        self.dropTableViewFiles = AssetTypeDropTableView()
         self.buttonRename = QtWidgets.QPushButton("Rename")
         self.buttonClear = QtWidgets.QPushButton("Clear")
 
@@ -42,13 +185,15 @@ class RenamingWindow(WindowTemplate):
         self.centralWidgetLayout = QtWidgets.QVBoxLayout()
         self.centralWidgetLayout.addWidget(self.labelNameInstruction)
         self.centralWidgetLayout.addWidget(self.lineEditAssetName)
-        self.centralWidgetLayout.addWidget(self.dropListWidgetFiles)
+        self.centralWidgetLayout.addWidget(self.dropTableViewFiles)
         self.centralWidgetLayout.addWidget(self.buttonRename)
         self.centralWidgetLayout.addWidget(self.buttonClear)
 
     def connectWidgets(self):
         self.buttonRename.clicked.connect(self.renameFiles)
-        self.buttonClear.clicked.connect(lambda : self.dropListWidgetFiles.clear())
+        self.buttonClear.clicked.connect(lambda : self.dropTableViewFiles.clear())
+        #a guess arriving after the rename would change the type of a file that already got its name
+        self.dropTableViewFiles.classifyingChanged.connect(lambda classifying: self.buttonRename.setEnabled(not classifying))
     
     def renameFiles(self):
         assetName = self.lineEditAssetName.text()
@@ -58,59 +203,56 @@ class RenamingWindow(WindowTemplate):
         self.buttonRename.setText("Rename")
         print(assetName)
         
-        # initialize a dict to avoid multiple assets with same type
-        assetTypeDict = {}
-        for assetType in AssetType:
-            assetTypeDict[assetType.name] = 0
-
-        # iterate through each entry 
-        for i in range(self.dropListWidgetFiles.count()):
-            #extract path and asset type from custom widget
-            
-
-            assetTypeEntry : AssetTypeEntry = self.dropListWidgetFiles.itemWidget(self.dropListWidgetFiles.item(i))
-            if not isinstance(assetTypeEntry, AssetTypeEntry):
-                print("Error: assetTypeEntry is not AssetTypeEntry class")
+        # collect path and prefix of every row from the model
+        assetTypeModel = self.dropTableViewFiles.assetTypeModel
+        entries = []
+        rows = []
+        for i in range(assetTypeModel.rowCount()):
+            assetPath = assetTypeModel.getAssetPath(i)
+            assetTypeName = assetTypeModel.getAssetTypeName(i)
+            if assetTypeName == '':
+                print(f"Skipping {assetPath}: no asset type for this file")
+                continue
+            entries.append((assetPath, getAssetTypePrefix(assetTypeName)))
+            rows.append(i)
+
+        # plan every rename first, nothing is touched if any of them would collide
+        plan = planRenames(assetName, entries)
+        if not plan.isValid():
+            for conflict in plan.conflicts:
+                print(f"Conflict: {conflict}")
+            self.buttonRename.setText(f"{len(plan.conflicts)} conflicts, nothing renamed. Click again to Rename")
+            return
+
+        #a journal next to the assets means an earlier rename crashed halfway, offer to put those files back first
+        journalPath = journalPathFor(plan) if plan.renames else None
+        if journalPath and os.path.exists(journalPath):
+            answer = QtWidgets.QMessageBox.question(self, "Unfinished rename", f"An earlier rename did not finish ({journalPath}).\nUndo it now?")
+            if answer != QtWidgets.QMessageBox.Yes:
+                self.buttonRename.setText("Unfinished rename left, nothing renamed. Click again to Rename")
                 return
-            assetPath = assetTypeEntry.getAssetPath()
-            directory = os.path.split(assetPath)[0]
-            fileName = os.path.split(assetPath)[1]
-            assetTypeName = assetTypeEntry.getAssetTypeName()
-            filePrefix = getAssetTypePrefix(assetTypeName)
-            fileRoot, fileSuffix = os.path.splitext(assetPath)
-            
-
-            #check for multiple assets of the same type
-            if assetTypeDict[assetTypeName] > 0:
-                fileSuffix = '_' + str(assetTypeDict[assetTypeName]) + fileSuffix
-            assetTypeDict[assetTypeName] += 1
-
-            #overwrite with new asset name with prefix
-            fileName = filePrefix + assetName + fileSuffix
-            newFilePath = f"{directory}/{fileName}"
-            print(f"new path: {newFilePath}")
+            try:
+                failedRollbacks = rollbackJournal(journalPath)
+            except (RenameError, OSError, ValueError) as e:
+                print(e)
+                failedRollbacks = [e]
+            if failedRollbacks:
+                self.buttonRename.setText(f"Could not undo the unfinished rename, see {journalPath}")
+            else:
+                self.buttonRename.setText("Unfinished rename undone. Check the files and click again to Rename")
+            return
 
-            #Rename
-            os.rename(assetPath, newFilePath)
-            #print("Rename Successfully")
-
-            #After renaming, also change the path in the GUI
-            assetTypeEntry.setNewAssetPath(newFilePath)
-
-def getAssetTypePrefix(assetTypeName:str) -> str:
-    if assetTypeName == AssetType.STATIC_MESH.name:
-        return 'SM_'
-    elif assetTypeName == AssetType.SKELETAL_MESH.name:
-        return 'SKM_'
-    elif assetTypeName == AssetType.ALBEDO.name:
-        return 'T_Albedo_' 
-    elif assetTypeName == AssetType.RGB_MASK.name:
-        return 'T_Mask_'   
-    elif assetTypeName == AssetType.NORMAL_MAP.name:
-        return 'T_Normal_'
-    else:
-        print("Error: invalid asset type")
-        return ''
+        try:
+            renames = applyRenamePlan(plan)
+        except (RenameError, OSError) as e:
+            print(e)
+            self.buttonRename.setText("Rename failed, changes undone. Click again to Rename")
+            return
+
+        #After renaming, also change the paths in the GUI
+        for entryIndex, assetPath, newFilePath in renames:
+            print(f"new path: {newFilePath}")
+            assetTypeModel.setNewAssetPath(rows[entryIndex], newFilePath)
 
 def main():
     import sys